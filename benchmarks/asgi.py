@@ -0,0 +1,93 @@
+"""Full ASGI round trips through a Starlette application."""
+
+import asyncio
+import contextlib
+
+from harness import benchmark
+from starlette.applications import Starlette
+from starlette.routing import Route
+
+from starlette_problem import error, handler
+
+
+async def raise_problem(_request):
+    msg = "User not found."
+    raise error.NotFoundProblem(msg)
+
+
+async def raise_exception(_request):
+    msg = "Something went bad."
+    raise RuntimeError(msg)
+
+
+def app(**kwargs):
+    app_ = Starlette(
+        routes=[
+            Route("/problem", raise_problem),
+            Route("/unhandled", raise_exception),
+        ],
+    )
+    handler.add_exception_handler(app_, **kwargs)
+    return app_
+
+
+def round_trip(path, **kwargs):
+    loop = asyncio.new_event_loop()
+    app_ = app(**kwargs)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"test")],
+        "client": ("127.0.0.1", 123),
+        "server": ("test", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(_message):
+        return None
+
+    async def call():
+        # ServerErrorMiddleware re-raises once the response has been sent.
+        with contextlib.suppress(RuntimeError):
+            await app_(dict(scope), receive, send)
+
+    return lambda: loop.run_until_complete(call())
+
+
+@benchmark("asgi.not-found")
+def not_found():
+    return round_trip("/missing")
+
+
+@benchmark("asgi.problem")
+def problem():
+    return round_trip("/problem")
+
+
+@benchmark("asgi.unhandled")
+def unhandled():
+    return round_trip("/unhandled")
+
+
+@benchmark("asgi.middleware.not-found")
+def middleware_not_found():
+    return round_trip("/missing", middleware=True)
+
+
+@benchmark("asgi.middleware.problem")
+def middleware_problem():
+    return round_trip("/problem", middleware=True)
+
+
+@benchmark("asgi.middleware.unhandled")
+def middleware_unhandled():
+    return round_trip("/unhandled", middleware=True)
@@ -0,0 +1,41 @@
+"""Compare JSON encoder backends on representative problem payloads."""
+
+import contextlib
+
+from harness import benchmark
+
+from starlette_problem import encoder, error
+
+PAYLOADS = {
+    "not-found": error.NotFoundProblem("Not Found").marshal(),
+    "server-error": error.ServerProblem(
+        "Upstream request failed.",
+        trace_id="0af7651916cd43dd8448eb211c80319c",
+        upstream="https://payments.internal/v1/charges",
+        attempt=3,
+        retryable=True,
+    ).marshal(uri="https://docs.example.com/errors/{type}"),
+    "validation-100": error.UnprocessableProblem(
+        "Request validation failed.",
+        errors=[
+            {"loc": ["body", "items", i, "name"], "msg": "Field required.", "type": "missing", "input": None}
+            for i in range(100)
+        ],
+    ).marshal(),
+    "unicode": error.BadRequestProblem("Paramètre « quantité » invalide ✗", field="quantité").marshal(),
+}
+
+BACKENDS = {"json": encoder.json_encoder}
+with contextlib.suppress(ImportError):
+    BACKENDS["orjson"] = encoder.get_encoder("orjson")
+
+
+def register(backend, encode, name, payload):
+    @benchmark(f"encoder.{backend}.{name}")
+    def setup():
+        return lambda: encode(payload)
+
+
+for backend_, encode_ in BACKENDS.items():
+    for name_, payload_ in PAYLOADS.items():
+        register(backend_, encode_, name_, payload_)
@@ -0,0 +1,87 @@
+"""ExceptionHandler hot path, direct calls without a running application."""
+
+from harness import benchmark
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+
+from starlette_problem import error, handler
+
+
+def request(headers=()):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "query_string": b"",
+        "headers": list(headers),
+    })
+
+
+def exception_handler(count, **kwargs):
+    """An ExceptionHandler with `count` handlers, returning the exception matching the last registered."""
+    errors = [type(f"Error{i}", (Exception,), {}) for i in range(count)]
+
+    def handler_(_eh, _request, exc):
+        return error.Problem("Handled.", detail=str(exc), status=400)
+
+    eh = handler.ExceptionHandler(handlers=dict.fromkeys(errors, handler_), **kwargs)
+    exc = errors[-1]("bad") if errors else RuntimeError("bad")
+    return eh, exc
+
+
+def register_handlers(count):
+    @benchmark(f"handler.call.handlers-{count}")
+    def setup():
+        eh, exc = exception_handler(count)
+        req = request()
+        return lambda: eh(req, exc)
+
+
+for count_ in (0, 10, 500):
+    register_handlers(count_)
+
+
+@benchmark("handler.call.problem")
+def problem():
+    eh, _ = exception_handler(10)
+    req = request()
+    exc = error.NotFoundProblem("User not found.", user_id="123")
+    return lambda: eh(req, exc)
+
+
+@benchmark("handler.call.http-exception")
+def http_exception():
+    eh = handler.ExceptionHandler(handlers={HTTPException: handler.http_exception_handler_})
+    req = request()
+    exc = HTTPException(404)
+    return lambda: eh(req, exc)
+
+
+@benchmark("handler.http_exception_handler_")
+def http_exception_handler():
+    eh = handler.ExceptionHandler()
+    req = request()
+    exc = HTTPException(404)
+    return lambda: handler.http_exception_handler_(eh, req, exc)
+
+
+class PayloadError(Exception):
+    """Exception formatting a large payload in __str__, like many client library errors."""
+
+    def __init__(self, payload):
+        super().__init__()
+        self.payload = payload
+
+    def __str__(self):
+        return f"Request failed: {self.payload!r}"
+
+
+@benchmark("handler.call.handled-expensive-str")
+def handled_expensive_str():
+    def handler_(_eh, _request, _exc):
+        return error.BadRequestProblem("Request failed.")
+
+    eh = handler.ExceptionHandler(handlers={PayloadError: handler_})
+    req = request()
+    exc = PayloadError({f"field{i}": list(range(20)) for i in range(200)})
+    return lambda: eh(req, exc)
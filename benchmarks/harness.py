@@ -0,0 +1,98 @@
+"""Minimal benchmark harness.
+
+Benchmarks are registered by decorating a setup function with
+`@benchmark(name)`, the setup function returns the zero argument callable to
+time. Results are compared against the stored baseline, and regressions above
+the threshold are reported with a non zero exit code.
+"""
+
+import argparse
+import json
+import pathlib
+import platform
+import sys
+import timeit
+
+BASELINE = pathlib.Path(__file__).parent / "baseline.json"
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return decorator
+
+
+def measure(fn, repeat=5):
+    """Time fn, returning the best seconds per call over `repeat` runs."""
+    timer = timeit.Timer(fn)
+    number, taken = timer.autorange()
+    if taken > 1:
+        # Slow cases (large schemas) already produced a stable sample.
+        repeat = 1
+    return min(taken, *timer.repeat(repeat=repeat, number=number)) / number
+
+
+def load_baseline(path):
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())["results"]
+
+
+def save_baseline(path, results):
+    baseline = load_baseline(path)
+    baseline.update(results)
+    data = {
+        "python": platform.python_version(),
+        "platform": platform.platform(terse=True),
+        "results": dict(sorted(baseline.items())),
+    }
+    path.write_text(json.dumps(data, indent=2) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", "--filter", default="", help="Only run benchmarks containing this substring.")
+    parser.add_argument("--save", action="store_true", help="Store results as the new baseline.")
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE, help="Baseline results file.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before failing (0.25=25%%).")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs per benchmark, the best is kept.")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    results, regressions = {}, []
+
+    print(f"{'benchmark':<48}{'usec/op':>12}{'baseline':>12}{'change':>10}")
+    for name, setup in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+
+        results[name] = seconds = measure(setup(), args.repeat)
+        previous = baseline.get(name)
+        change = ""
+        if previous:
+            ratio = seconds / previous - 1
+            change = f"{ratio:+.1%}"
+            if ratio > args.threshold:
+                regressions.append(name)
+                change += " !"
+
+        previous_usec = f"{previous * 1e6:.2f}" if previous else "-"
+        print(f"{name:<48}{seconds * 1e6:>12.2f}{previous_usec:>12}{change:>10}")
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"\nBaseline saved to {args.baseline}.")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Builtin post hooks."""
+
+from handler import request
+from harness import benchmark
+
+from starlette_problem import handler
+from starlette_problem.cors import CorsConfiguration
+from starlette_problem.responses import ProblemResponse
+
+CONTENT = {
+    "type": "something-wrong",
+    "title": "Something went wrong.",
+    "status": 500,
+    "trace_id": "0af7651916cd43dd8448eb211c80319c",
+    "detail": "Upstream request failed.",
+}
+
+
+BODY = ProblemResponse(CONTENT).body
+RAW_HEADERS = [(b"content-type", b"application/problem+json"), (b"content-length", str(len(BODY)).encode())]
+
+
+def response():
+    # Hooks mutate the response headers, start each call from a fresh response.
+    return ProblemResponse.from_rendered(500, BODY, list(RAW_HEADERS))
+
+
+@benchmark("hooks.cors.allow-all")
+def cors_allow_all():
+    hook = handler.CorsPostHook(
+        CorsConfiguration(allow_origins=["*"], allow_methods=["*"], allow_headers=["*"], allow_credentials=True),
+    )
+    req = request([(b"origin", b"https://app.example.com"), (b"cookie", b"session=abc")])
+    return lambda: hook(CONTENT, req, response())
+
+
+@benchmark("hooks.cors.allow-list")
+def cors_allow_list():
+    hook = handler.CorsPostHook(
+        CorsConfiguration(
+            allow_origins=[f"https://app{i}.example.com" for i in range(20)],
+            allow_methods=["GET", "POST"],
+            allow_headers=["*"],
+            allow_credentials=True,
+        ),
+    )
+    req = request([(b"origin", b"https://app19.example.com")])
+    return lambda: hook(CONTENT, req, response())
+
+
+@benchmark("hooks.strip-extras.strip")
+def strip_extras():
+    hook = handler.StripExtrasPostHook(enabled=True)
+    req = request()
+    return lambda: hook(CONTENT, req, response())
+
+
+@benchmark("hooks.strip-extras.excluded")
+def strip_extras_excluded():
+    hook = handler.StripExtrasPostHook(exclude=[400, 404, "type:something-wrong"], enabled=True)
+    req = request()
+    return lambda: hook(CONTENT, req, response())
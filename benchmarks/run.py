@@ -0,0 +1,18 @@
+"""Run the benchmark suite.
+
+$ python benchmarks/run.py              # compare against the stored baseline
+$ python benchmarks/run.py -k handler   # only benchmarks containing "handler"
+$ python benchmarks/run.py --save       # store results as the new baseline
+"""
+
+import sys
+
+import asgi  # noqa: F401
+import encoder  # noqa: F401
+import handler  # noqa: F401
+import hooks  # noqa: F401
+import schemas  # noqa: F401
+from harness import main
+
+if __name__ == "__main__":
+    sys.exit(main())
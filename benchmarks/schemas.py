@@ -0,0 +1,40 @@
+"""OpenAPI schema generation on synthetic applications."""
+
+from harness import benchmark
+from starlette.routing import Route
+
+from starlette_problem.error import UnauthorisedProblem
+from starlette_problem.schemas import SchemaGenerator
+
+
+def endpoint(_request):
+    """
+    responses:
+      200:
+        description: A list of items.
+      401:
+        content:
+          application/problem+json:
+            schema:
+              $ref: '#/components/schemas/UnauthorisedProblem'
+    """
+
+
+def routes(count):
+    return [Route(f"/items{i}", endpoint=endpoint, methods=["GET", "POST"]) for i in range(count)]
+
+
+def register(count):
+    @benchmark(f"schemas.get_schema.routes-{count}")
+    def setup():
+        schemas = SchemaGenerator(
+            {"openapi": "3.0.0", "info": {"title": "Example API", "version": "1.0"}},
+            problems=[UnauthorisedProblem],
+            generic_defaults=True,
+        )
+        routes_ = routes(count)
+        return lambda: schemas.get_schema(routes_)
+
+
+for count_ in (10, 100, 1000, 5000):
+    register(count_)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import dataclasses
+import threading
+import typing as t
+from collections import OrderedDict
+
+if t.TYPE_CHECKING:
+    import rfc9457
+
+
+@dataclasses.dataclass(frozen=True)
+class RenderedProblem:
+    status: int
+    content: dict[str, t.Any]
+    body: bytes | None
+    raw_headers: tuple[tuple[bytes, bytes], ...]
+    # Compressed variants of body by content coding, filled on first use.
+    compressed: dict[str, bytes] = dataclasses.field(default_factory=dict, compare=False, repr=False)
+
+
+class ResponseCache:
+    """Bounded LRU cache of rendered problem responses.
+
+    Entries are limited both in number and in the total size of the cached
+    bodies, the least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 1024 * 1024) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._entries: OrderedDict[t.Hashable, RenderedProblem] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(problem: rfc9457.Problem) -> t.Hashable | None:
+        """Generate a cache key for a problem, or None if it can not be cached.
+
+        Problems with extras are never cached, the extras are free form and
+        commonly unique per occurrence.
+        """
+        if problem.extras:
+            return None
+
+        headers = tuple(problem.headers.items()) if problem.headers else ()
+        key = (type(problem), problem.status, problem.type, problem.title, problem.detail, headers)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key: t.Hashable) -> RenderedProblem | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: t.Hashable, entry: RenderedProblem) -> None:
+        size = len(entry.body or b"")
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            existing = self._entries.pop(key, None)
+            if existing is not None:
+                self.size -= len(existing.body or b"")
+
+            self._entries[key] = entry
+            self.size += size
+
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.body or b"")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
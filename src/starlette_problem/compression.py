@@ -0,0 +1,32 @@
+"""Gzip compression of problem bodies.
+
+Problem responses produced for unhandled exceptions never pass through
+Starlette's `GZipMiddleware`, large bodies are compressed by the exception
+handler instead. Output is deterministic (no modification time in the gzip
+header), so compressed bodies can be cached alongside the encoded body.
+"""
+
+from __future__ import annotations
+
+import typing as t
+import zlib
+
+# wbits for a gzip container, rather than a raw zlib stream.
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def gzip_compress(body: bytes, level: int = 6) -> bytes:
+    """Compress a body into a gzip container."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
+async def gzip_stream(chunks: t.AsyncIterable[bytes], level: int = 6) -> t.AsyncIterator[bytes]:
+    """Incrementally compress a chunked body into a gzip container."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
@@ -0,0 +1,164 @@
+"""Encoders used to render problem bodies.
+
+All JSON encoders produce identical compact output (no whitespace, non-ascii
+characters left unescaped), matching `starlette.responses.JSONResponse`, for
+the values found in problem payloads. Floats requiring exponent notation are
+the exception, orjson renders `1e16` where the standard library renders
+`1e+16`, both decode to the same value.
+
+orjson natively serializes some values the standard library handles
+differently. Datetimes, dataclasses and subclasses of builtin types (str enums
+etc) are passed through and non string keys rejected, content holding them is
+encoded by the standard library instead, so it is rendered, or rejected, exactly as
+`JSONResponse` would. Checking content for the remaining differences would
+cost as much as encoding it with the standard library, so orjson renders them:
+
+- non finite floats as `null`, where the standard library raises `ValueError`,
+- UUIDs as strings and enums by value, where the standard library raises
+  `TypeError`.
+
+Select `encoder="json"` if these must be rejected.
+
+Compact binary formats (msgpack, cbor) can be negotiated by clients as an
+alternative to JSON, their backends are imported when first requested.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import typing as t
+
+if t.TYPE_CHECKING:
+    from types import ModuleType
+
+Encoder = t.Callable[[t.Any], bytes]
+
+PROBLEM_JSON = "application/problem+json"
+
+
+def json_encoder(content: t.Any) -> bytes:  # noqa: ANN401
+    """Encode content as compact JSON using the standard library."""
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+_iter_encoder = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def iter_encode(content: t.Any, chunk_size: int = 64 * 1024) -> t.Iterator[bytes]:  # noqa: ANN401
+    """Incrementally encode content as compact JSON, in chunks of about chunk_size bytes.
+
+    Output is identical to `json_encoder`, without holding the whole body in memory.
+    """
+    buffer, size = [], 0
+    for part in _iter_encoder.iterencode(content):
+        data = part.encode("utf-8")
+        buffer.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+
+    if buffer:
+        yield b"".join(buffer)
+
+
+@functools.cache
+def _import_orjson() -> ModuleType | None:
+    """Import orjson on first use, None if it is not installed.
+
+    orjson pulls in zoneinfo, uuid etc, keep it out of the module import.
+    """
+    try:
+        import orjson  # noqa: PLC0415
+    except ImportError:  # pragma: no cover
+        return None
+    return orjson
+
+
+def orjson_encoder(content: t.Any) -> bytes:  # noqa: ANN401
+    """Encode content as compact JSON using orjson.
+
+    Content orjson would render differently (datetimes, dataclasses, subclasses
+    of builtin types, non string keys) or does not support (integers exceeding
+    64 bits etc) falls back to the standard library encoder.
+    """
+    orjson = _import_orjson()
+    try:
+        # Without a `default`, orjson raises for passthrough types.
+        return orjson.dumps(  # ty: ignore[possibly-missing-attribute]
+            content,
+            option=orjson.OPT_PASSTHROUGH_DATETIME  # ty: ignore[possibly-missing-attribute]
+            | orjson.OPT_PASSTHROUGH_DATACLASS  # ty: ignore[possibly-missing-attribute]
+            | orjson.OPT_PASSTHROUGH_SUBCLASS,  # ty: ignore[possibly-missing-attribute]
+        )
+    except TypeError:
+        return json_encoder(content)
+
+
+ENCODERS: dict[str, Encoder] = {
+    "json": json_encoder,
+    "orjson": orjson_encoder,
+}
+
+
+def get_encoder(encoder: str | Encoder = "auto") -> Encoder:
+    """Resolve an encoder setting into an encoder.
+
+    `auto` selects the fastest installed backend, falling back to the standard
+    library, a callable is returned as is.
+    """
+    if callable(encoder):
+        return encoder
+
+    if encoder == "auto":
+        return orjson_encoder if _import_orjson() is not None else json_encoder
+
+    if encoder not in ENCODERS:
+        msg = f"Unknown encoder '{encoder}', expected one of {['auto', *ENCODERS]}."
+        raise ValueError(msg)
+
+    if encoder == "orjson" and _import_orjson() is None:
+        msg = "The orjson encoder requires orjson to be installed."
+        raise ImportError(msg)
+
+    return ENCODERS[encoder]
+
+
+def _msgpack_encoder() -> Encoder:
+    import msgpack  # noqa: PLC0415
+
+    return msgpack.packb
+
+
+def _cbor_encoder() -> Encoder:
+    import cbor2  # noqa: PLC0415
+
+    return cbor2.dumps
+
+
+# Format name: (media type, package, encoder loader)
+FORMATS: dict[str, tuple[str, str, t.Callable[[], Encoder]]] = {
+    "msgpack": ("application/problem+msgpack", "msgpack", _msgpack_encoder),
+    "cbor": ("application/problem+cbor", "cbor2", _cbor_encoder),
+}
+
+
+def get_format(name: str) -> tuple[str, Encoder]:
+    """Resolve a binary format name into its media type and encoder."""
+    if name not in FORMATS:
+        msg = f"Unknown format '{name}', expected one of {list(FORMATS)}."
+        raise ValueError(msg)
+
+    media_type, package, load = FORMATS[name]
+    try:
+        return media_type, load()
+    except ImportError as e:
+        msg = f"The {name} format requires {package} to be installed."
+        raise ImportError(msg) from e
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import collections
+import contextlib
+import json
+import threading
+import time
+import traceback
+import typing as t
+
+import anyio
+
+from starlette_problem.util import fingerprint
+
+if t.TYPE_CHECKING:
+    import pathlib
+
+    import rfc9457
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+
+
+ProblemEvent = dict[str, t.Any]
+
+
+class Transport(t.Protocol):
+    async def send(self, events: list[ProblemEvent]) -> None: ...
+
+
+class FileTransport:
+    """Append problem events to a file as JSON lines.
+
+    A local stand-in for a collector, also usable with a named pipe or a
+    socket file that a local agent reads from.
+    """
+
+    def __init__(self, path: str | pathlib.Path) -> None:
+        self.path = path
+
+    async def send(self, events: list[ProblemEvent]) -> None:
+        data = "".join(json.dumps(event, separators=(",", ":")) + "\n" for event in events)
+        await anyio.to_thread.run_sync(self._write, data)
+
+    def _write(self, data: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:  # noqa: PTH123
+            f.write(data)
+
+
+def _format_tracebacks(events: list[ProblemEvent]) -> None:
+    """Format the recorded frames of events into tracebacks, including source lines."""
+    for event in events:
+        frames = event["traceback"]
+        if not isinstance(frames, str):
+            summary = traceback.StackSummary.from_list([traceback.FrameSummary(*frame) for frame in frames])
+            event["traceback"] = "".join(summary.format())
+
+
+class ProblemExporter:
+    """Export compact problem events to a collector, in batches.
+
+    Events are buffered, and flushed by a background task once `batch_size`
+    events are buffered, or `flush_interval` seconds have passed. The buffer
+    is bounded, when full either the oldest or the newest events are dropped
+    (counted in `dropped`). Batches the transport fails to send are counted
+    in `failed`.
+
+    The background task runs for the lifetime of the application, see
+    `install`, remaining events are flushed on shutdown.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        transport: Transport,
+        *,
+        batch_size: int = 100,
+        flush_interval: float = 5.0,
+        max_buffer: int = 10_000,
+        drop: t.Literal["oldest", "newest"] = "oldest",
+        min_status: int = 500,
+        frames: int = 5,
+        shutdown_timeout: float = 10.0,
+    ) -> None:
+        if drop not in {"oldest", "newest"}:
+            msg = f"Unknown drop policy '{drop}', expected one of ['oldest', 'newest']."
+            raise ValueError(msg)
+
+        self.transport = transport
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.drop = drop
+        self.min_status = min_status
+        self.frames = frames
+        self.shutdown_timeout = shutdown_timeout
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._buffer: collections.deque[ProblemEvent] = collections.deque()
+        self._lock = threading.Lock()
+        # Checked by the background task, rather than woken up, as events are
+        # recorded from both the event loop and threadpool workers.
+        self._tick = min(flush_interval, 0.1)
+
+    def record(self, request: Request, exc: Exception, problem: rfc9457.Problem) -> None:
+        """Buffer an event for a problem, never blocks."""
+        if problem.status < self.min_status:
+            return
+
+        route = request.scope.get("route")
+        exc_type = type(exc)
+        event = {
+            "type": problem.type,
+            "status": problem.status,
+            "fingerprint": fingerprint(exc, problem),
+            "route": getattr(route, "path", None) or request.url.path,
+            "timestamp": time.time(),
+            "exception": f"{exc_type.__module__}.{exc_type.__qualname__}",
+            # Source lines are read from disk, formatting is left to the flush.
+            "traceback": [
+                (frame.f_code.co_filename, lineno, frame.f_code.co_name)
+                for frame, lineno in collections.deque(traceback.walk_tb(exc.__traceback__), maxlen=self.frames)
+            ],
+        }
+
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                if self.drop == "newest":
+                    return
+                self._buffer.popleft()
+            self._buffer.append(event)
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    async def flush(self) -> None:
+        """Send all buffered events, in batches."""
+        while True:
+            with self._lock:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            if not batch:
+                return
+
+            try:
+                await anyio.to_thread.run_sync(_format_tracebacks, batch)
+                await self.transport.send(batch)
+            except anyio.get_cancelled_exc_class():
+                # Keep the batch for the final flush on shutdown.
+                with self._lock:
+                    self._buffer.extendleft(reversed(batch))
+                raise
+            except Exception:  # noqa: BLE001
+                self.failed += len(batch)
+            else:
+                self.exported += len(batch)
+
+    async def run(self) -> None:
+        """Flush events by size or time, until cancelled."""
+        last_flush = time.monotonic()
+        while True:
+            await anyio.sleep(self._tick)
+            if len(self._buffer) >= self.batch_size or (
+                self._buffer and time.monotonic() - last_flush >= self.flush_interval
+            ):
+                await self.flush()
+                last_flush = time.monotonic()
+
+    @contextlib.asynccontextmanager
+    async def running(self) -> t.AsyncIterator[None]:
+        """Run the background task, flushing remaining events on exit."""
+        try:
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(self.run)
+                try:
+                    yield
+                finally:
+                    tg.cancel_scope.cancel()
+        finally:
+            # The background task has stopped, an interrupted batch is back in the buffer.
+            with anyio.CancelScope(shield=True), anyio.move_on_after(self.shutdown_timeout):
+                await self.flush()
+
+    def install(self, app: Starlette) -> None:
+        """Run the exporter for the lifetime of an application, wrapping its lifespan."""
+        lifespan_context = app.router.lifespan_context
+
+        @contextlib.asynccontextmanager
+        async def lifespan(app: Starlette) -> t.AsyncIterator[t.Any]:
+            async with self.running(), lifespan_context(app) as state:
+                yield state
+
+        app.router.lifespan_context = lifespan
@@ -1,39 +1,185 @@
 from __future__ import annotations
 
+import dataclasses
+import functools
 import http
-import json
+import inspect
+import logging
+import time
 import typing as t
 from warnings import warn
 
+import anyio
 import rfc9457
+from starlette._utils import is_async_callable
+from starlette.datastructures import MutableHeaders
 from starlette.exceptions import HTTPException
-from starlette.middleware.cors import CORSMiddleware
 from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
+from starlette.responses import JSONResponse, Response, StreamingResponse
 
+from starlette_problem.cache import RenderedProblem
+from starlette_problem.encoder import PROBLEM_JSON, get_encoder, get_format
 from starlette_problem.error import Problem, StatusProblem
-from starlette_problem.util import convert_status_code
+from starlette_problem.responses import ProblemResponse, raw_problem_headers
+from starlette_problem.util import accepts_encoding, convert_status_code, negotiate_media_type, status_table
 
 if t.TYPE_CHECKING:
-    import logging
-
     from starlette.applications import Starlette
 
+    from starlette_problem.cache import ResponseCache
     from starlette_problem.cors import CorsConfiguration
+    from starlette_problem.encoder import Encoder
+    from starlette_problem.export import ProblemExporter
+    from starlette_problem.log import LogSampler, QueueLogger
+    from starlette_problem.metrics import MetricsSink
 
 
 ExceptionType = t.TypeVar("ExceptionType", bound=Exception)
 ResponseType = t.TypeVar("ResponseType", bound=Response)
 ExceptionHandlerType = t.TypeVar("ExceptionHandlerType", bound="ExceptionHandler")
-Handler = t.Callable[[ExceptionHandlerType, Request, ExceptionType], Problem]
+Handler = t.Callable[
+    [ExceptionHandlerType, Request, ExceptionType],
+    Problem | t.Awaitable[Problem | None] | None,
+]
 PreHook = t.Callable[[Request, Exception], None]
 PostHook = t.Callable[[dict, Request, ResponseType], tuple[dict, ResponseType]]
+CallableType = t.TypeVar("CallableType", bound=t.Callable)
+
+
+class _ObservedDict(dict):
+    """Mapping that notifies its owner whenever it is mutated.
+
+    Holds a copy of the mapping it is created from, later changes to the
+    original are not observed.
+    """
+
+    def __init__(self, mapping: dict, on_change: t.Callable[[], None]) -> None:
+        super().__init__(mapping)
+        self._on_change = on_change
+
+    def __setitem__(self, key: t.Any, value: t.Any) -> None:  # noqa: ANN401
+        super().__setitem__(key, value)
+        self._on_change()
+
+    def __delitem__(self, key: t.Any) -> None:  # noqa: ANN401
+        super().__delitem__(key)
+        self._on_change()
+
+    def __ior__(self, other: t.Any) -> _ObservedDict:  # noqa: ANN401, PYI034
+        super().__ior__(other)
+        self._on_change()
+        return self
+
+    def clear(self) -> None:
+        super().clear()
+        self._on_change()
+
+    def pop(self, key: t.Any, *default: t.Any) -> t.Any:  # noqa: ANN401
+        value = super().pop(key, *default)
+        self._on_change()
+        return value
+
+    def popitem(self) -> tuple[t.Any, t.Any]:
+        item = super().popitem()
+        self._on_change()
+        return item
+
+    def setdefault(self, key: t.Any, default: t.Any = None) -> t.Any:  # noqa: ANN401
+        value = super().setdefault(key, default)
+        self._on_change()
+        return value
+
+    def update(self, *args: t.Any, **kwargs: t.Any) -> None:  # noqa: ANN401
+        super().update(*args, **kwargs)
+        self._on_change()
+
+
+class _ObservedList(list):
+    """List that notifies its owner whenever it is mutated.
+
+    Added items are validated before the list is modified, so an invalid item
+    never ends up in the list. Holds a copy of the items it is created from,
+    later changes to the original are not observed.
+    """
+
+    def __init__(
+        self,
+        items: list,
+        on_change: t.Callable[[], None],
+        validate: t.Callable[[t.Any], None] | None = None,
+    ) -> None:
+        self._validate = validate
+        self._check(items)
+        super().__init__(items)
+        self._on_change = on_change
+
+    def _check(self, items: t.Iterable) -> None:
+        if self._validate is not None:
+            for item in items:
+                self._validate(item)
+
+    def __setitem__(self, index: t.Any, value: t.Any) -> None:  # noqa: ANN401
+        if isinstance(index, slice):
+            value = list(value)
+            self._check(value)
+        else:
+            self._check([value])
+        super().__setitem__(index, value)
+        self._on_change()
+
+    def __delitem__(self, index: t.Any) -> None:  # noqa: ANN401
+        super().__delitem__(index)
+        self._on_change()
+
+    def __iadd__(self, other: t.Any) -> _ObservedList:  # noqa: ANN401, PYI034
+        other = list(other)
+        self._check(other)
+        super().__iadd__(other)
+        self._on_change()
+        return self
+
+    def append(self, item: t.Any) -> None:  # noqa: ANN401
+        self._check([item])
+        super().append(item)
+        self._on_change()
+
+    def extend(self, items: t.Iterable) -> None:
+        items = list(items)
+        self._check(items)
+        super().extend(items)
+        self._on_change()
+
+    def insert(self, index: t.SupportsIndex, item: t.Any) -> None:  # noqa: ANN401
+        self._check([item])
+        super().insert(index, item)
+        self._on_change()
+
+    def pop(self, index: t.SupportsIndex = -1) -> t.Any:  # noqa: ANN401
+        item = super().pop(index)
+        self._on_change()
+        return item
+
+    def remove(self, item: t.Any) -> None:  # noqa: ANN401
+        super().remove(item)
+        self._on_change()
+
+    def clear(self) -> None:
+        super().clear()
+        self._on_change()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._on_change()
+
+    def sort(self, **kwargs: t.Any) -> None:  # noqa: ANN401
+        super().sort(**kwargs)
+        self._on_change()
 
 
 class ExceptionHandler:
     def __init__(  # noqa: PLR0913
         self,
-        logger: logging.Logger | None = None,
+        logger: logging.Logger | QueueLogger | None = None,
         unhandled_wrappers: dict[str, type[StatusProblem]] | None = None,
         handlers: dict[type[Exception], Handler] | None = None,
         pre_hooks: list[PreHook] | None = None,
@@ -41,7 +187,32 @@ class ExceptionHandler:
         documentation_uri_template: str = "",
         *,
         strict_rfc9457: bool = False,
+        dispatch_cache_size: int = 256,
+        response_cache: ResponseCache | None = None,
+        encoder: str | Encoder = "auto",
+        single_pass: bool = False,
+        log_sampler: LogSampler | None = None,
+        metrics: MetricsSink | None = None,
+        hook_timeout: float | None = None,
+        hook_budget: float | None = None,
+        handler_timeout: float | None = None,
+        max_list_length: int | None = None,
+        max_body_bytes: int | None = None,
+        stream_threshold: int | None = None,
+        exporter: ProblemExporter | None = None,
+        formats: list[str] | None = None,
+        accept_cache_size: int = 128,
+        compress_threshold: int | None = None,
+        compress_level: int = 6,
+        hook_cache_size: int = 256,
     ) -> None:
+        # Handlers applicable to each concrete exception type are resolved once
+        # and memoized, the cache is dropped whenever `handlers` changes.
+        self._dispatch = functools.lru_cache(maxsize=dispatch_cache_size)(self._resolve_handlers)
+        # Likewise hook chains, per exception type for pre hooks, and per
+        # (status, type, exception type) for post hooks.
+        self._pre_chain = functools.lru_cache(maxsize=hook_cache_size)(self._resolve_pre_hooks)
+        self._post_chain = functools.lru_cache(maxsize=hook_cache_size)(self._resolve_post_hooks)
         self.logger = logger
         self.unhandled_wrappers = unhandled_wrappers or {}
         self.handlers = handlers or {}
@@ -49,13 +220,163 @@ class ExceptionHandler:
         self.post_hooks = post_hooks or []
         self.documentation_uri_template = documentation_uri_template
         self.strict = strict_rfc9457
+        self.response_cache = response_cache
+        self.encoder = get_encoder(encoder)
+        self.single_pass = single_pass
+        self.log_sampler = log_sampler
+        self.metrics = metrics
+        self.hook_timeout = hook_timeout
+        self.hook_budget = hook_budget
+        self.handler_timeout = handler_timeout
+        self.max_list_length = max_list_length
+        self.max_body_bytes = max_body_bytes
+        self.stream_threshold = stream_threshold
+        self.exporter = exporter
+        # Alternative encodings, by media type, negotiated from the Accept
+        # header. Clients send few distinct Accept values, memoize them.
+        self.formats = dict(get_format(name) for name in formats or [])
+        self._accept = functools.lru_cache(maxsize=accept_cache_size)(self._resolve_format)
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+    @property
+    def unhandled_wrappers(self) -> dict[str, type[StatusProblem]]:
+        return self._unhandled_wrappers
+
+    @unhandled_wrappers.setter
+    def unhandled_wrappers(self, unhandled_wrappers: dict[str, type[StatusProblem]]) -> None:
+        self._unhandled_wrappers = _ObservedDict(unhandled_wrappers, self._resolve_wrappers)
+        self._resolve_wrappers()
+
+    def _resolve_wrappers(self) -> None:
+        """Resolve wrappers, including families ("5xx"), into a flat status code table."""
+        self._wrappers = status_table(self._unhandled_wrappers)
+        self._default_wrapper = self._unhandled_wrappers.get("default", self._wrappers.get(500))
+
+    def wrapper_for(self, status_code: int) -> type[StatusProblem] | None:
+        """Get the unhandled wrapper for a status code, if any."""
+        return self._wrappers.get(status_code)
+
+    @property
+    def handlers(self) -> dict[type[Exception], Handler]:
+        return self._handlers
+
+    @handlers.setter
+    def handlers(self, handlers: dict[type[Exception], Handler]) -> None:
+        self._handlers = _ObservedDict(handlers, self._dispatch.cache_clear)
+        self._dispatch.cache_clear()
+
+    def _resolve_handlers(self, exc_type: type[Exception]) -> tuple[Handler, ...]:
+        """Collect the handlers applicable to an exception type, in registration order."""
+        return tuple(handler for handled, handler in self._handlers.items() if issubclass(exc_type, handled))
+
+    @property
+    def pre_hooks(self) -> list[PreHook]:
+        return self._pre_hooks
+
+    @pre_hooks.setter
+    def pre_hooks(self, pre_hooks: list[PreHook]) -> None:
+        self._pre_hooks = _ObservedList(pre_hooks, self._pre_chain.cache_clear, validate=self._validate_pre_hook)
+        self._pre_chain.cache_clear()
+
+    @staticmethod
+    def _validate_pre_hook(pre_hook: PreHook) -> None:
+        if isinstance(pre_hook, FilteredHook) and pre_hook.include:
+            msg = f"Pre hook {pre_hook!r} can only be filtered by exception, problems are not resolved yet."
+            raise ValueError(msg)
+
+    @property
+    def post_hooks(self) -> list[PostHook]:
+        return self._post_hooks
+
+    @post_hooks.setter
+    def post_hooks(self, post_hooks: list[PostHook]) -> None:
+        self._post_hooks = _ObservedList(post_hooks, self._post_chain.cache_clear)
+        self._post_chain.cache_clear()
+
+    def _resolve_pre_hooks(self, exc_type: type[Exception]) -> tuple[PreHook, ...]:
+        """Collect the pre hooks applicable to an exception type, in registration order."""
+        return tuple(
+            pre_hook
+            for pre_hook in self._pre_hooks
+            if not isinstance(pre_hook, FilteredHook) or pre_hook.matches_exception(exc_type)
+        )
+
+    def _resolve_post_hooks(
+        self,
+        status: int,
+        type_: str,
+        exc_type: type[Exception],
+        single_pass: bool,  # noqa: FBT001
+    ) -> tuple[tuple, tuple[PostHook, ...]]:
+        """Collect the post hooks applicable to a problem, split into single pass content hooks and response hooks."""
+        post_hooks = [
+            post_hook
+            for post_hook in self._post_hooks
+            if not isinstance(post_hook, FilteredHook) or post_hook.matches(status, type_, exc_type)
+        ]
+        if not single_pass:
+            return (), tuple(post_hooks)
+
+        content_hooks = tuple(post_hook for post_hook in post_hooks if hasattr(post_hook, "process_content"))
+        return content_hooks, tuple(post_hook for post_hook in post_hooks if not hasattr(post_hook, "process_content"))
 
     def __call__(self, request: Request, exc: Exception) -> Response:
-        for pre_hook in self.pre_hooks:
+        return self._handle(request, exc)
+
+    def _handle(self, request: Request, exc: Exception) -> Response:
+        start = time.perf_counter() if self.metrics is not None else 0.0
+
+        for pre_hook in self._pre_chain(type(exc)):
             pre_hook(request, exc)
 
-        wrapper = self.unhandled_wrappers.get("default", self.unhandled_wrappers.get("500"))
-        ret = (
+        ret = self._resolve(request, exc)
+        if self.exporter is not None:
+            self.exporter.record(request, exc, ret)
+
+        response = self._render(request, self._marshal(ret), ret.type, type(exc))
+
+        if self.metrics is not None:
+            self.metrics.record(ret.status, ret.type, type(exc), time.perf_counter() - start)
+
+        return response
+
+    def _resolve_format(self, accept: str) -> tuple[str, Encoder] | None:
+        """Resolve the negotiated format for an Accept header value, None for JSON."""
+        media_type = negotiate_media_type(accept, (PROBLEM_JSON, *self.formats))
+        if media_type is None or media_type == PROBLEM_JSON:
+            return None
+        return media_type, self.formats[media_type]
+
+    def _negotiate(self, request: Request, headers: MutableHeaders) -> Encoder | None:
+        """Negotiate the problem encoding, updating the response headers, None for JSON."""
+        if not self.formats:
+            return None
+
+        headers.add_vary_header("Accept")
+        negotiated = self._accept(request.headers.get("accept", ""))
+        if negotiated is None:
+            return None
+
+        media_type, encoder = negotiated
+        headers["content-type"] = media_type
+        return encoder
+
+    def _resolve(self, request: Request, exc: Exception) -> rfc9457.Problem:
+        """Resolve the problem to render for an exception, logging server errors."""
+        ret = None
+
+        for handler in self._dispatch(type(exc)):
+            response = handler(self, request, exc)
+            if response is not None:
+                ret = response
+                break
+
+        return self._resolved(exc, ret)
+
+    def _default(self, exc: Exception) -> rfc9457.Problem:
+        wrapper = self._default_wrapper
+        return (
             wrapper(str(exc))
             if wrapper
             else Problem(
@@ -65,41 +386,361 @@ class ExceptionHandler:
             )
         )
 
-        for exc_type, handler in self.handlers.items():
-            if isinstance(exc, exc_type):
-                response = handler(self, request, exc)
-                if response is not None:
-                    ret = response
-                    break
-
+    def _resolved(self, exc: Exception, ret: rfc9457.Problem | None) -> rfc9457.Problem:
         if isinstance(exc, rfc9457.Problem):
             ret = exc
+        elif ret is None:
+            # Only built when nothing else resolved the exception, str() can
+            # be expensive for some exceptions.
+            ret = self._default(exc)
 
         if ret.status >= http.HTTPStatus.INTERNAL_SERVER_ERROR and self.logger:
-            self.logger.exception(ret.title, exc_info=(type(exc), exc, exc.__traceback__))
+            self._log(exc, ret)
+
+        return ret
+
+    def _log(self, exc: Exception, ret: rfc9457.Problem) -> None:
+        if self.log_sampler is not None and not self.log_sampler.sample(self.logger, exc, ret):
+            return
 
-        headers = {"content-type": "application/problem+json"}
-        headers.update(ret.headers or {})
+        self.logger.exception(ret.title, exc_info=(type(exc), exc, exc.__traceback__))
+
+    def _marshal(self, ret: rfc9457.Problem) -> RenderedProblem:
+        """Marshal a problem, reusing a previously cached render if available."""
+        key = self.response_cache.key(ret) if self.response_cache is not None else None
+        if key is not None:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                return cached
 
         content = ret.marshal(
             uri=self.documentation_uri_template,
             strict=self.strict,
         )
-        response = JSONResponse(
-            status_code=ret.status,
+        # The body is only encoded up front when the render is cached for
+        # reuse, otherwise once post hooks have processed the content.
+        rendered = RenderedProblem(
+            status=ret.status,
             content=content,
-            headers=headers,
+            body=self.encoder(content) if key is not None else None,
+            raw_headers=raw_problem_headers(ret.headers),
         )
 
-        for post_hook in self.post_hooks:
+        if key is not None:
+            self.response_cache.set(key, rendered)
+
+        return rendered
+
+    def _render(
+        self,
+        request: Request,
+        rendered: RenderedProblem,
+        problem_type: str,
+        exc_type: type[Exception],
+    ) -> Response:
+        """Run post hooks and build the final response."""
+        # Post hooks are free to modify content and headers, give them copies
+        # so cached renders are never mutated.
+        content = dict(rendered.content)
+        raw_headers = list(rendered.raw_headers)
+        content_hooks, post_hooks = self._post_hooks_for(rendered, problem_type, exc_type)
+
+        headers = MutableHeaders(raw=raw_headers)
+        encoder = self._negotiate(request, headers)
+        for post_hook in content_hooks:
+            content = post_hook.process_content(content, request, rendered.status, headers)
+
+        content, body, response = self._response(rendered, content, raw_headers, encoder)
+
+        for post_hook in post_hooks:
             content, response = post_hook(content, request, response)
+
+        return self._finalize(request, rendered, response, body)
+
+    def _post_hooks_for(
+        self,
+        rendered: RenderedProblem,
+        problem_type: str,
+        exc_type: type[Exception],
+    ) -> tuple[tuple, tuple[PostHook, ...]]:
+        """Get the (cached) post hook chains for a rendered problem.
+
+        Keyed on the problem's own type, the rendered type may have been
+        expanded through the documentation uri template.
+        """
+        return self._post_chain(rendered.status, problem_type, exc_type, self.single_pass)
+
+    def _response(
+        self,
+        rendered: RenderedProblem,
+        content: dict,
+        raw_headers: list[tuple[bytes, bytes]],
+        encoder: Encoder | None = None,
+    ) -> tuple[dict, bytes | None, Response]:
+        """Encode content and build the response, returning the (possibly truncated) content and body.
+
+        `encoder` overrides the JSON encoder for negotiated formats.
+        """
+        body = rendered.body
+        if body is None or content != rendered.content or encoder is not None:
+            content, body, chunks = self._encode(content, encoder)
+            if chunks is not None:
+                response = StreamingResponse(chunks, status_code=rendered.status)
+                response.raw_headers = raw_headers
+                return content, None, response
+
+        raw_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        response = ProblemResponse.from_rendered(rendered.status, body, raw_headers, encoder=encoder or self.encoder)
+        return content, body, response
+
+    def _encode(
+        self,
+        content: dict,
+        encoder: Encoder | None = None,
+    ) -> tuple[dict, bytes | None, t.Iterator[bytes] | None]:
+        """Encode content, applying size limits, or streaming it if large.
+
+        Negotiated formats are never streamed, size limits are applied to the
+        JSON encoding of their content.
+        """
+        if self.max_list_length is not None:
+            from starlette_problem.limits import truncate_lists  # noqa: PLC0415
+
+            content = truncate_lists(content, self.max_list_length)
+
+        if self.max_body_bytes is not None:
+            from starlette_problem.limits import encode_within  # noqa: PLC0415
+
+            content, body = encode_within(content, self.max_body_bytes)
+            return content, body if encoder is None else encoder(content), None
+
+        if encoder is not None:
+            return content, encoder(content), None
+
+        if self.stream_threshold is not None:
+            from starlette_problem.limits import buffer_encode  # noqa: PLC0415
+
+            body, chunks = buffer_encode(content, self.stream_threshold)
+            return content, body, chunks
+
+        return content, self.encoder(content), None
+
+    def _finalize(
+        self,
+        request: Request,
+        rendered: RenderedProblem,
+        response: Response,
+        body: bytes | None,
+    ) -> Response:
+        """Apply final body changes, once all post hooks have run."""
+        if isinstance(response, StreamingResponse):
+            if self.compress_threshold is not None:
+                self._compress_stream(request, response)
+            return response
+
+        if self.compress_threshold is not None and len(response.body) >= self.compress_threshold:
+            self._compress(request, rendered, response)
+
+        # content-length was set for the encoded body, only update it if post
+        # hooks or compression replaced the body.
+        if response.body is not body:
             response.headers["content-length"] = str(len(response.body))
 
         return response
 
+    def _compress(self, request: Request, rendered: RenderedProblem, response: Response) -> None:
+        """Gzip the response body if the client accepts it."""
+        headers = response.headers
+        if "content-encoding" in headers:
+            return
+
+        headers.add_vary_header("Accept-Encoding")
+        if not accepts_encoding(request.headers.get("accept-encoding", ""), "gzip"):
+            return
+
+        from starlette_problem.compression import gzip_compress  # noqa: PLC0415
+
+        if response.body is rendered.body:
+            # Unchanged (possibly cached) body, compress it once.
+            compressed = rendered.compressed.get("gzip")
+            if compressed is None:
+                compressed = rendered.compressed["gzip"] = gzip_compress(response.body, self.compress_level)
+        else:
+            compressed = gzip_compress(response.body, self.compress_level)
+
+        response.body = compressed
+        headers["content-encoding"] = "gzip"
+
+    def _compress_stream(self, request: Request, response: StreamingResponse) -> None:
+        """Gzip a streamed body if the client accepts it, streamed bodies always exceed the threshold."""
+        headers = response.headers
+        if "content-encoding" in headers:
+            return
+
+        headers.add_vary_header("Accept-Encoding")
+        if accepts_encoding(request.headers.get("accept-encoding", ""), "gzip"):
+            from starlette_problem.compression import gzip_stream  # noqa: PLC0415
+
+            response.body_iterator = gzip_stream(response.body_iterator, self.compress_level)
+            headers["content-encoding"] = "gzip"
+
+
+class AsyncExceptionHandler(ExceptionHandler):
+    """ExceptionHandler awaited directly on the event loop.
+
+    Starlette runs synchronous exception handlers in the threadpool, this
+    variant avoids the hop. Only suitable when all handlers and hooks are
+    non-blocking.
+
+    Hooks may also be coroutines. Pre hooks are run concurrently, post hooks
+    are run in order. Each coroutine hook is bound by `hook_timeout`, and all
+    coroutine hooks for an exception share the `hook_budget`. A hook that
+    times out or fails is skipped.
+
+    Handlers may be coroutines too, bound by `handler_timeout`. A handler
+    that times out falls back to the default problem.
+    """
+
+    async def __call__(self, request: Request, exc: Exception) -> Response:
+        start = time.perf_counter()
+        deadline = start + self.hook_budget if self.hook_budget is not None else None
+
+        pending = []
+        for pre_hook in self._pre_chain(type(exc)):
+            result = pre_hook(request, exc)
+            if inspect.isawaitable(result):
+                pending.append((pre_hook, result))
+
+        if pending:
+            async with anyio.create_task_group() as tg:
+                for pre_hook, result in pending:
+                    tg.start_soon(self._await_hook, pre_hook, result, deadline)
+
+        ret = await self._resolve_async(request, exc)
+        if self.exporter is not None:
+            self.exporter.record(request, exc, ret)
+
+        response = await self._render_async(request, self._marshal(ret), ret.type, type(exc), deadline)
+
+        if self.metrics is not None:
+            self.metrics.record(ret.status, ret.type, type(exc), time.perf_counter() - start)
+
+        return response
+
+    async def _resolve_async(self, request: Request, exc: Exception) -> rfc9457.Problem:
+        """Resolve the problem for an exception, awaiting coroutine handlers."""
+        ret = None
+
+        for handler in self._dispatch(type(exc)):
+            response = handler(self, request, exc)
+            if inspect.isawaitable(response):
+                response = await self._await_handler(handler, response, request, exc)
+            if response is not None:
+                ret = response
+                break
+
+        return self._resolved(exc, ret)
+
+    async def _await_handler(
+        self,
+        handler: Handler,
+        awaitable: t.Awaitable[Problem | None],
+        request: Request,
+        exc: Exception,
+    ) -> rfc9457.Problem | None:
+        """Await a coroutine handler, falling back to the default problem if it misses its deadline."""
+        with anyio.move_on_after(self.handler_timeout):
+            return await awaitable
+
+        if self.logger:
+            self.logger.log(logging.WARNING, "Handler %r timed out after %.3fs.", handler, self.handler_timeout)
+
+        if isinstance(exc, HTTPException):
+            # Keep the status code of http exceptions.
+            return http_exception_handler_(self, request, exc)
+        return self._default(exc)
+
+    async def _render_async(
+        self,
+        request: Request,
+        rendered: RenderedProblem,
+        problem_type: str,
+        exc_type: type[Exception],
+        deadline: float | None,
+    ) -> Response:
+        """Run post hooks, awaiting coroutine hooks, and build the final response."""
+        content = dict(rendered.content)
+        raw_headers = list(rendered.raw_headers)
+        content_hooks, post_hooks = self._post_hooks_for(rendered, problem_type, exc_type)
+
+        headers = MutableHeaders(raw=raw_headers)
+        encoder = self._negotiate(request, headers)
+        for post_hook in content_hooks:
+            result = post_hook.process_content(content, request, rendered.status, headers)
+            if inspect.isawaitable(result):
+                done, result = await self._await_hook(post_hook, result, deadline)
+                if not done:
+                    continue
+            content = result
+
+        content, body, response = self._response(rendered, content, raw_headers, encoder)
+
+        for post_hook in post_hooks:
+            result = post_hook(content, request, response)
+            if inspect.isawaitable(result):
+                done, result = await self._await_hook(post_hook, result, deadline)
+                if not done:
+                    continue
+            content, response = result
+
+        return self._finalize(request, rendered, response, body)
+
+    async def _await_hook(
+        self,
+        hook: t.Callable,
+        awaitable: t.Awaitable[t.Any],
+        deadline: float | None,
+    ) -> tuple[bool, t.Any]:
+        """Await a coroutine hook within its timeout, returning whether it completed and its result."""
+        timeout = self.hook_timeout
+        if deadline is not None:
+            remaining = max(deadline - time.perf_counter(), 0)
+            timeout = remaining if timeout is None else min(timeout, remaining)
+
+        if timeout is not None and timeout <= 0:
+            # Budget exhausted, skip the hook without starting it.
+            if inspect.iscoroutine(awaitable):
+                awaitable.close()
+            if self.logger:
+                self.logger.log(logging.WARNING, "Hook %r skipped, hook budget exhausted.", hook)
+            return False, None
+
+        with anyio.move_on_after(timeout):
+            try:
+                return True, await awaitable
+            except Exception:
+                if self.logger:
+                    self.logger.exception("Hook %r failed.", hook)
+                return False, None
+
+        if self.logger:
+            self.logger.log(logging.WARNING, "Hook %r timed out after %.3fs.", hook, timeout)
+        return False, None
+
+
+def non_blocking(func: CallableType) -> CallableType:
+    """Mark a handler or hook as safe to run on the event loop."""
+    func.non_blocking = True  # ty: ignore[unresolved-attribute]
+    return func
 
+
+def is_non_blocking(func: t.Callable) -> bool:
+    return getattr(func, "non_blocking", False) or is_async_callable(func)
+
+
+@non_blocking
 def http_exception_handler_(eh: ExceptionHandlerType, _request: Request, exc: HTTPException) -> Problem:
-    wrapper = eh.unhandled_wrappers.get(str(exc.status_code))
+    wrapper = eh.wrapper_for(exc.status_code)
     title, type_ = convert_status_code(exc.status_code)
     detail = exc.detail
     return (
@@ -116,10 +757,35 @@ def http_exception_handler_(eh: ExceptionHandlerType, _request: Request, exc: HT
 
 
 class CorsPostHook:
-    def __init__(self, config: CorsConfiguration) -> None:
+    non_blocking = True
+
+    def __init__(self, config: CorsConfiguration, cache_size: int = 256) -> None:
+        # Imported lazily to keep the cost off applications not using CORS.
+        from starlette.middleware.cors import CORSMiddleware  # noqa: PLC0415
+
         self.config = config
+        # Have the middleware do the heavy lifting for us to parse all the
+        # config, once, then reuse it for every response.
+        self.cors = CORSMiddleware(
+            app=None,  # ty: ignore[invalid-argument-type]
+            allow_origins=config.allow_origins,
+            allow_credentials=config.allow_credentials,
+            allow_methods=config.allow_methods,
+            allow_headers=config.allow_headers,
+        )
+        # Decisions only depend on the origin and cookie presence, memoize the
+        # resulting headers to keep cross-origin error storms cheap.
+        self._headers_for = functools.lru_cache(maxsize=cache_size)(self._resolve_headers)
 
     def __call__(self, content: dict, request: Request, response: Response) -> tuple[dict, Response]:
+        self._apply(request, response.headers)
+        return content, response
+
+    def process_content(self, content: dict, request: Request, _status: int, headers: MutableHeaders) -> dict:
+        self._apply(request, headers)
+        return content
+
+    def _apply(self, request: Request, headers: MutableHeaders) -> None:
         # Since the CORSMiddleware is not executed when an unhandled server exception
         # occurs, we need to manually set the CORS headers ourselves if we want the FE
         # to receive a proper JSON 500, opposed to a CORS error.
@@ -131,40 +797,108 @@ class CorsPostHook:
         origin = request.headers.get("origin")
 
         if origin:
-            # Have the middleware do the heavy lifting for us to parse
-            # all the config, then update our response headers
-            mw = CORSMiddleware(
-                app=None,  # ty: ignore[invalid-argument-type]
-                allow_origins=self.config.allow_origins,
-                allow_credentials=self.config.allow_credentials,
-                allow_methods=self.config.allow_methods,
-                allow_headers=self.config.allow_headers,
-            )
+            cors_headers, vary = self._headers_for(origin, "cookie" in request.headers)
+            headers.update(cors_headers)
+            if vary:
+                headers.add_vary_header("Origin")
 
-            # Logic directly from Starlette"s CORSMiddleware:
-            # https://github.com/encode/starlette/blob/master/starlette/middleware/cors.py#L152
+    def _resolve_headers(self, origin: str, has_cookie: bool) -> tuple[dict[str, str], bool]:  # noqa: FBT001
+        """Resolve the CORS headers for an origin, and whether they vary by origin."""
+        # Logic directly from Starlette"s CORSMiddleware:
+        # https://github.com/encode/starlette/blob/master/starlette/middleware/cors.py#L152
+        cors_headers = dict(self.cors.simple_headers)
 
-            response.headers.update(mw.simple_headers)
-            has_cookie = "cookie" in request.headers
+        # If request includes any cookie headers, then we must respond
+        # with the specific origin instead of "*".
+        if self.cors.allow_all_origins and has_cookie:
+            cors_headers["Access-Control-Allow-Origin"] = origin
 
-            # If request includes any cookie headers, then we must respond
-            # with the specific origin instead of "*".
-            if mw.allow_all_origins and has_cookie:
-                response.headers["Access-Control-Allow-Origin"] = origin
+        # If we only allow specific origins, then we have to mirror back
+        # the Origin header in the response.
+        elif not self.cors.allow_all_origins and self.cors.is_allowed_origin(origin=origin):
+            cors_headers["Access-Control-Allow-Origin"] = origin
+            return cors_headers, True
 
-            # If we only allow specific origins, then we have to mirror back
-            # the Origin header in the response.
-            elif not mw.allow_all_origins and mw.is_allowed_origin(origin=origin):
-                response.headers["Access-Control-Allow-Origin"] = origin
-                response.headers.add_vary_header("Origin")
+        return cors_headers, False
 
-        return content, response
+
+@dataclasses.dataclass(frozen=True)
+class _StatusRules:
+    """Compiled include/exclude rules, matching status codes, families (5xx) and types."""
+
+    statuses: frozenset[int] = frozenset()
+    families: frozenset[int] = frozenset()
+    types: frozenset[str] = frozenset()
+
+    @classmethod
+    def compile(cls, rules: list[int | str]) -> _StatusRules:
+        statuses, families, types = set(), set(), set()
+        for rule in rules:
+            if isinstance(rule, int):
+                statuses.add(rule)
+            elif rule.startswith("type:"):
+                types.add(rule[5:])
+            elif rule.isdigit():
+                statuses.add(int(rule))
+            elif len(rule) == 3 and rule[0].isdigit() and rule[1:].lower() == "xx":  # noqa: PLR2004
+                families.add(int(rule[0]))
+            else:
+                msg = f"Invalid rule {rule!r}, expected a status code, status family (5xx) or 'type:<type>'."
+                raise ValueError(msg)
+
+        return cls(frozenset(statuses), frozenset(families), frozenset(types))
+
+    def __bool__(self) -> bool:
+        return bool(self.statuses or self.families or self.types)
+
+    def match(self, status: int, type_: str) -> bool:
+        return status in self.statuses or status // 100 in self.families or type_ in self.types
+
+
+class FilteredHook:
+    """Hook that only runs for matching problems.
+
+    `include` accepts status codes, status families (5xx) and types
+    (`"type:my-type"`), any of which must match, `exceptions` limits the hook
+    to subclasses of the given exception classes. Pre hooks run before the
+    problem is resolved, so can only be filtered by exception.
+    """
+
+    def __init__(
+        self,
+        hook: t.Callable,
+        include: list[int | str] | None = None,
+        exceptions: list[type[Exception]] | None = None,
+    ) -> None:
+        self.hook = hook
+        self.include = include or []
+        self.exceptions = tuple(exceptions or ())
+        self.non_blocking = is_non_blocking(hook)
+        self._include = _StatusRules.compile(self.include)
+
+    def __call__(self, *args: t.Any) -> t.Any:  # noqa: ANN401
+        return self.hook(*args)
+
+    def __getattr__(self, name: str) -> t.Any:  # noqa: ANN401
+        # Expose the hook's optional methods, such as `process_content`.
+        if name == "hook":
+            raise AttributeError(name)
+        return getattr(self.hook, name)
+
+    def __repr__(self) -> str:
+        return f"FilteredHook({self.hook!r}, include={self.include!r}, exceptions={list(self.exceptions)!r})"
+
+    def matches_exception(self, exc_type: type[Exception]) -> bool:
+        return not self.exceptions or issubclass(exc_type, self.exceptions)
+
+    def matches(self, status: int, type_: str, exc_type: type[Exception]) -> bool:
+        return (not self._include or self._include.match(status, type_)) and self.matches_exception(exc_type)
 
 
 class StripExtrasPostHook:
     def __init__(  # noqa: PLR0913
         self,
-        logger: logging.Logger | None = None,
+        logger: logging.Logger | QueueLogger | None = None,
         mandatory_fields: list[str] | None = None,
         exclude_status_codes: list[int | str] | None = None,
         include_status_codes: list[int | str] | None = None,
@@ -172,6 +906,7 @@ class StripExtrasPostHook:
         exclude: list[int | str] | None = None,
         *,
         enabled: bool = False,
+        cache_size: int = 256,
     ) -> None:
         self.mandatory_fields = mandatory_fields or ["type", "title", "status", "detail"]
         self.enabled = enabled
@@ -190,35 +925,56 @@ class StripExtrasPostHook:
         self.exclude = exclude or exclude_status_codes or []
         self.include = include or include_status_codes or []
         self.logger = logger
+        # Stripped fields are logged inline, only safe on the event loop if
+        # the logger does not block.
+        self.non_blocking = logger is None or is_non_blocking(logger)
+        # Rules are compiled once, and the decision memoized per (status, type).
+        self._mandatory = frozenset(self.mandatory_fields)
+        self._include = _StatusRules.compile(self.include)
+        self._exclude = _StatusRules.compile(self.exclude)
+        self._should_strip = functools.lru_cache(maxsize=cache_size)(self._resolve_strip)
 
     def __call__(self, content: dict, _request: Request, response: JSONResponse) -> tuple[dict, JSONResponse]:
-        strip_extras = self.enabled and (
-            (response.status_code in self.include or f"type:{content['type']}" in self.include)
-            or (
-                not self.include
-                and (response.status_code not in self.exclude and f"type:{content['type']}" not in self.exclude)
-            )
-        )
+        new_content = self._strip(content, response.status_code)
+        if new_content is None:
+            return content.copy(), response
+
+        if isinstance(response, StreamingResponse):
+            # Stripped content is small, replace a streamed body outright.
+            headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+            return new_content, ProblemResponse(new_content, status_code=response.status_code, headers=headers)
+
+        response.body = response.render(new_content)
+        return new_content, response
+
+    def process_content(self, content: dict, _request: Request, status: int, _headers: MutableHeaders) -> dict:
+        new_content = self._strip(content, status)
+        return content if new_content is None else new_content
+
+    def _resolve_strip(self, status: int, type_: str) -> bool:
+        if self._include:
+            return self._include.match(status, type_)
+        return not self._exclude.match(status, type_)
 
-        new_content = content.copy()
-        if strip_extras:
-            msg = "Stripping debug information from exception."
-            self.logger.debug(msg) if self.logger else None
+    def _strip(self, content: dict, status: int) -> dict | None:
+        """Strip extras from content, returns None if extras should be kept."""
+        if not self.enabled or not self._should_strip(status, content["type"]):
+            return None
 
+        mandatory = self._mandatory
+        if self.logger:
+            self.logger.debug("Stripping debug information from exception.")
             for k, v in content.items():
-                if k not in self.mandatory_fields:
+                if k not in mandatory:
                     msg = f"Removed {k}: {v}"
-                    self.logger.debug(msg) if self.logger else None
-                    new_content.pop(k)
+                    self.logger.debug(msg)
 
-            response.body = json.dumps(new_content, separators=(",", ":")).encode("utf-8")
-
-        return new_content, response
+        return {k: v for k, v in content.items() if k in mandatory}
 
 
 def add_exception_handler(  # noqa: PLR0913
     app: Starlette,
-    logger: logging.Logger | None = None,
+    logger: logging.Logger | QueueLogger | None = None,
     cors: CorsConfiguration | None = None,
     unhandled_wrappers: dict[str, type[StatusProblem]] | None = None,
     handlers: dict[type[Exception], Handler] | None = None,
@@ -228,6 +984,23 @@ def add_exception_handler(  # noqa: PLR0913
     http_exception_handler: Handler = http_exception_handler_,
     *,
     strict_rfc9457: bool = False,
+    response_cache: ResponseCache | None = None,
+    encoder: str | Encoder = "auto",
+    single_pass: bool = False,
+    log_sampler: LogSampler | None = None,
+    metrics: MetricsSink | None = None,
+    middleware: bool = False,
+    async_handler: bool | None = None,
+    hook_timeout: float | None = None,
+    hook_budget: float | None = None,
+    handler_timeout: float | None = None,
+    max_list_length: int | None = None,
+    max_body_bytes: int | None = None,
+    stream_threshold: int | None = None,
+    exporter: ProblemExporter | None = None,
+    formats: list[str] | None = None,
+    compress_threshold: int | None = None,
+    compress_level: int = 6,
 ) -> ExceptionHandler:
     handlers = handlers or {}
     handlers.update({
@@ -241,7 +1014,17 @@ def add_exception_handler(  # noqa: PLR0913
         # Ensure runs before custom modifications
         post_hooks.insert(0, CorsPostHook(cors))
 
-    eh = ExceptionHandler(
+    callables = [*handlers.values(), *pre_hooks, *post_hooks]
+    if async_handler is None:
+        # Logging formats tracebacks and does handler I/O, only a QueueLogger
+        # (or a logger marked non-blocking) is safe on the event loop.
+        async_handler = all(is_non_blocking(f) for f in callables) and (logger is None or is_non_blocking(logger))
+    elif not async_handler and any(is_async_callable(f.hook if isinstance(f, FilteredHook) else f) for f in callables):
+        msg = "Coroutine handlers and hooks require the async exception handler."
+        raise ValueError(msg)
+
+    eh_class = AsyncExceptionHandler if async_handler else ExceptionHandler
+    eh = eh_class(
         logger=logger,
         unhandled_wrappers=unhandled_wrappers,
         handlers=handlers,
@@ -249,10 +1032,51 @@ def add_exception_handler(  # noqa: PLR0913
         post_hooks=post_hooks,
         documentation_uri_template=documentation_uri_template,
         strict_rfc9457=strict_rfc9457,
+        response_cache=response_cache,
+        encoder=encoder,
+        single_pass=single_pass,
+        log_sampler=log_sampler,
+        metrics=metrics,
+        hook_timeout=hook_timeout,
+        hook_budget=hook_budget,
+        handler_timeout=handler_timeout,
+        max_list_length=max_list_length,
+        max_body_bytes=max_body_bytes,
+        stream_threshold=stream_threshold,
+        exporter=exporter,
+        formats=formats,
+        compress_threshold=compress_threshold,
+        compress_level=compress_level,
     )
 
-    app.add_exception_handler(Exception, eh)
-    app.add_exception_handler(rfc9457.Problem, eh)
-    app.add_exception_handler(HTTPException, eh)
+    if exporter is not None:
+        exporter.install(app)
+
+    if log_sampler is not None and logger is not None:
+        log_sampler.install(app, logger)
+
+    if middleware:
+        from starlette.middleware import Middleware  # noqa: PLC0415
+
+        from starlette_problem.middleware import ProblemMiddleware, reraise  # noqa: PLC0415
+
+        if app.middleware_stack is not None:
+            msg = "Cannot add middleware after an application has started"
+            raise RuntimeError(msg)
+
+        # Innermost user middleware, so other middleware also apply to
+        # problem responses. HTTPException is deferred from Starlette's
+        # ExceptionMiddleware, everything else propagates naturally.
+        app.user_middleware.append(Middleware(ProblemMiddleware, handler=eh))
+        app.add_exception_handler(HTTPException, reraise)
+        # Exceptions raised by other user middleware never reach the
+        # ProblemMiddleware, keep handling them at the outermost layer. Only
+        # Exception is handled there, handlers for subclasses would be
+        # registered with the ExceptionMiddleware, inside ProblemMiddleware.
+        app.add_exception_handler(Exception, eh)
+    else:
+        app.add_exception_handler(Exception, eh)
+        app.add_exception_handler(rfc9457.Problem, eh)
+        app.add_exception_handler(HTTPException, eh)
 
     return eh
@@ -0,0 +1,93 @@
+"""Bounded encoding of very large problem payloads.
+
+Problems with huge extras (tens of thousands of validation errors etc) can be
+truncated to a maximum list length and/or a maximum body size. Truncation is
+deterministic, and recorded in a `truncated` field mapping each truncated
+field to its original length (or `None` if the field was removed).
+"""
+
+from __future__ import annotations
+
+import itertools
+import typing as t
+
+from starlette_problem.encoder import iter_encode
+
+TRUNCATED_FIELD = "truncated"
+CORE_FIELDS = frozenset(("type", "title", "status", "detail", "instance"))
+
+
+def _mark(content: dict[str, t.Any], truncated: dict[str, int | None]) -> dict[str, t.Any]:
+    marker = content.get(TRUNCATED_FIELD)
+    content[TRUNCATED_FIELD] = {**marker, **truncated} if isinstance(marker, dict) else truncated
+    return content
+
+
+def truncate_lists(content: dict[str, t.Any], max_length: int) -> dict[str, t.Any]:
+    """Truncate top level list fields longer than max_length."""
+    truncated = {
+        k: len(v) for k, v in content.items() if k != TRUNCATED_FIELD and isinstance(v, list) and len(v) > max_length
+    }
+    if not truncated:
+        return content
+
+    return _mark({k: v[:max_length] if k in truncated else v for k, v in content.items()}, truncated)
+
+
+def _encode_bounded(content: dict[str, t.Any], max_bytes: int) -> bytes | None:
+    """Encode content, aborting as soon as the body exceeds max_bytes."""
+    chunks, size = [], 0
+    for chunk in iter_encode(content, chunk_size=min(max_bytes, 64 * 1024)):
+        size += len(chunk)
+        if size > max_bytes:
+            return None
+        chunks.append(chunk)
+
+    return b"".join(chunks)
+
+
+def encode_within(content: dict[str, t.Any], max_bytes: int) -> tuple[dict[str, t.Any], bytes]:
+    """Encode content within max_bytes, truncating it if required.
+
+    List fields are halved until the body fits, if it still does not fit all
+    fields except the core problem fields are removed. The body is never
+    fully encoded when it is too large, so memory use is bound by max_bytes.
+    """
+    body = _encode_bounded(content, max_bytes)
+    while body is None:
+        lists = {k: len(v) for k, v in content.items() if k != TRUNCATED_FIELD and isinstance(v, list) and v}
+        if lists:
+            marker = content.get(TRUNCATED_FIELD)
+            original = marker if isinstance(marker, dict) else {}
+            content = _mark(
+                {k: v[: len(v) // 2] if k in lists else v for k, v in content.items()},
+                {k: original.get(k, length) for k, length in lists.items()},
+            )
+        else:
+            # Nothing left to shorten, fall back to the core problem fields.
+            content = _mark(
+                {k: v for k, v in content.items() if k in CORE_FIELDS},
+                dict.fromkeys(k for k in content if k not in CORE_FIELDS and k != TRUNCATED_FIELD),
+            )
+            return content, b"".join(iter_encode(content))
+
+        body = _encode_bounded(content, max_bytes)
+
+    return content, body
+
+
+def buffer_encode(content: dict[str, t.Any], threshold: int) -> tuple[bytes | None, t.Iterator[bytes] | None]:
+    """Encode content, buffering at most threshold bytes.
+
+    Returns the complete body if it fits within threshold, otherwise an
+    iterator over the encoded chunks, continuing from the buffered ones.
+    """
+    chunks = iter_encode(content, chunk_size=min(threshold, 64 * 1024))
+    buffered, size = [], 0
+    for chunk in chunks:
+        buffered.append(chunk)
+        size += len(chunk)
+        if size > threshold:
+            return None, itertools.chain(buffered, chunks)
+
+    return b"".join(buffered), None
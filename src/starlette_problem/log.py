@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import atexit
+import contextlib
+import dataclasses
+import logging
+import queue
+import sys
+import threading
+import time
+import typing as t
+
+import anyio
+
+from starlette_problem.util import fingerprint
+
+if t.TYPE_CHECKING:
+    import rfc9457
+    from starlette.applications import Starlette
+
+_STOP = object()
+
+
+class QueueLogger:
+    """Log problems from a background thread.
+
+    Records are created on the calling thread, so timestamps and thread details
+    are accurate, filtering, traceback formatting and handler I/O happen on a
+    background thread, off the request path.
+
+    The queue is bounded, when full records are either dropped (counted in
+    `dropped`) or the caller blocks until space is available, depending on the
+    overflow policy. Queued records retain their traceback until emitted.
+    """
+
+    non_blocking = True
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        maxsize: int = 1000,
+        *,
+        overflow: t.Literal["drop", "block"] = "drop",
+        timeout: float | None = None,
+    ) -> None:
+        if overflow not in {"drop", "block"}:
+            msg = f"Unknown overflow policy '{overflow}', expected one of ['drop', 'block']."
+            raise ValueError(msg)
+
+        self.logger = logger
+        self.overflow = overflow
+        self.timeout = timeout
+        self.queue: queue.Queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def exception(
+        self,
+        msg: str,
+        *args: object,
+        exc_info: t.Any = True,  # noqa: ANN401
+        extra: t.Mapping[str, object] | None = None,
+        stacklevel: int = 1,
+    ) -> None:
+        self.log(logging.ERROR, msg, *args, exc_info=exc_info, extra=extra, stacklevel=stacklevel + 1)
+
+    def log(
+        self,
+        level: int,
+        msg: str,
+        *args: object,
+        exc_info: t.Any = None,  # noqa: ANN401
+        extra: t.Mapping[str, object] | None = None,
+        stacklevel: int = 1,
+    ) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+
+        if exc_info is True:
+            exc_info = sys.exc_info()
+
+        # The call site, as the logger would report it. Read from the frame
+        # directly, findCaller's frame offsets differ between python versions.
+        caller = sys._getframe(stacklevel)  # noqa: SLF001
+        record = self.logger.makeRecord(
+            self.logger.name,
+            level,
+            caller.f_code.co_filename,
+            caller.f_lineno,
+            msg,
+            args,
+            exc_info,
+            func=caller.f_code.co_name,
+            extra=extra,
+        )
+        self._put(record)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            self._thread = threading.Thread(target=self._run, name="starlette-problem-logger", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def close(self, timeout: float | None = None) -> None:
+        """Emit all queued records and stop the background thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+
+        if thread is None:
+            return
+
+        atexit.unregister(self.close)
+        self.queue.put(_STOP)
+        thread.join(timeout)
+
+    def _put(self, record: logging.LogRecord) -> None:
+        if self._thread is None:
+            self.start()
+
+        try:
+            if self.overflow == "block":
+                self.queue.put(record, timeout=self.timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            record = self.queue.get()
+            if record is _STOP:
+                return
+
+            # Logging failures must never take down the logging thread.
+            with contextlib.suppress(Exception):
+                self.logger.handle(record)
+
+
+@dataclasses.dataclass(slots=True)
+class _Occurrences:
+    title: str
+    start: float
+    count: int = 0
+    suppressed: int = 0
+
+
+class LogSampler:
+    """Limit the tracebacks logged for repeated problems.
+
+    Occurrences are grouped by fingerprint (exception class, problem type and
+    innermost frames). Within each window only the first `limit` occurrences of
+    a fingerprint should be logged in full, further occurrences are counted and
+    reported in a summary record once the window closes.
+
+    At most `max_fingerprints` are tracked, the oldest are summarised and
+    evicted first. Summaries are otherwise only emitted when a later occurrence
+    is sampled, `install` runs a background task which emits them as windows
+    close, and flushes the remainder on shutdown.
+    """
+
+    def __init__(
+        self,
+        window: float = 60.0,
+        limit: int = 5,
+        max_fingerprints: int = 1024,
+        frames: int = 3,
+        clock: t.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.window = window
+        self.limit = limit
+        self.max_fingerprints = max_fingerprints
+        self.frames = frames
+        self.clock = clock
+        self._entries: dict[str, _Occurrences] = {}
+        self._last_sweep = clock()
+        self._lock = threading.Lock()
+
+    def sample(self, logger: logging.Logger | QueueLogger, exc: BaseException, problem: rfc9457.Problem) -> bool:
+        """Record an occurrence, returns True if it should be logged in full."""
+        key = fingerprint(exc, problem, self.frames)
+        now = self.clock()
+        closed = []
+
+        with self._lock:
+            if now - self._last_sweep >= self.window:
+                closed.extend(self._sweep(now))
+
+            entry = self._entries.get(key)
+            if entry is None or now - entry.start >= self.window:
+                if entry is not None:
+                    closed.append((key, self._entries.pop(key)))
+                entry = self._entries[key] = _Occurrences(title=problem.title, start=now)
+
+                while len(self._entries) > self.max_fingerprints:
+                    oldest = next(iter(self._entries))
+                    closed.append((oldest, self._entries.pop(oldest)))
+
+            entry.count += 1
+            allowed = entry.count <= self.limit
+            if not allowed:
+                entry.suppressed += 1
+
+        self._summarise(logger, closed)
+        return allowed
+
+    def flush(self, logger: logging.Logger | QueueLogger) -> None:
+        """Summarise all tracked fingerprints, and reset."""
+        with self._lock:
+            closed = list(self._entries.items())
+            self._entries.clear()
+
+        self._summarise(logger, closed)
+
+    def sweep(self, logger: logging.Logger | QueueLogger) -> float:
+        """Summarise fingerprints whose window has closed, returns seconds until the next closes."""
+        now = self.clock()
+        with self._lock:
+            closed = self._sweep(now)
+            start = min((entry.start for entry in self._entries.values()), default=now)
+
+        self._summarise(logger, closed)
+        return start + self.window - now
+
+    async def run(self, logger: logging.Logger | QueueLogger) -> None:
+        """Summarise fingerprints as their window closes, until cancelled."""
+        while True:
+            delay = self.sweep(logger)
+            await anyio.sleep(delay)
+
+    @contextlib.asynccontextmanager
+    async def running(self, logger: logging.Logger | QueueLogger) -> t.AsyncIterator[None]:
+        """Run the background task, flushing remaining summaries on exit."""
+        try:
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(self.run, logger)
+                try:
+                    yield
+                finally:
+                    tg.cancel_scope.cancel()
+        finally:
+            self.flush(logger)
+
+    def install(self, app: Starlette, logger: logging.Logger | QueueLogger) -> None:
+        """Run the sampler for the lifetime of an application, wrapping its lifespan."""
+        lifespan_context = app.router.lifespan_context
+
+        @contextlib.asynccontextmanager
+        async def lifespan(app: Starlette) -> t.AsyncIterator[t.Any]:
+            async with self.running(logger), lifespan_context(app) as state:
+                yield state
+
+        app.router.lifespan_context = lifespan
+
+    def _sweep(self, now: float) -> list[tuple[str, _Occurrences]]:
+        self._last_sweep = now
+        expired = [key for key, entry in self._entries.items() if now - entry.start >= self.window]
+        return [(key, self._entries.pop(key)) for key in expired]
+
+    def _summarise(self, logger: logging.Logger | QueueLogger, closed: list[tuple[str, _Occurrences]]) -> None:
+        for key, entry in closed:
+            if entry.suppressed:
+                logger.log(
+                    logging.WARNING,
+                    "%s [fingerprint=%s]: suppressed %d of %d occurrences in %.0fs.",
+                    entry.title,
+                    key,
+                    entry.suppressed,
+                    entry.count,
+                    self.window,
+                )
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import typing as t
+
+from starlette.responses import Response
+
+if t.TYPE_CHECKING:
+    from starlette.requests import Request
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class MetricsSink(t.Protocol):
+    def record(self, status: int, problem_type: str, exc_type: type[BaseException], duration: float) -> None: ...
+
+
+class _Shard:
+    __slots__ = ("buckets", "count", "counts", "sum")
+
+    def __init__(self, buckets: int) -> None:
+        self.counts: dict[tuple[int, str, type[BaseException]], int] = {}
+        self.buckets = [0] * (buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class ProblemMetrics:
+    """In memory problem metrics, exposed in the Prometheus text format.
+
+    Problems are counted per (status, problem type, exception class), and the
+    time spent in the exception handler is recorded in a histogram. Each thread
+    records into its own shard, so recording never contends on a lock, shards
+    are aggregated on collection.
+    """
+
+    def __init__(self, buckets: t.Sequence[float] = DEFAULT_BUCKETS, namespace: str = "starlette_problem") -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.namespace = namespace
+        self._local = threading.local()
+        self._shards: list[_Shard] = []
+        self._lock = threading.Lock()
+
+    def record(self, status: int, problem_type: str, exc_type: type[BaseException], duration: float) -> None:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._new_shard()
+
+        key = (status, problem_type, exc_type)
+        shard.counts[key] = shard.counts.get(key, 0) + 1
+        shard.buckets[bisect.bisect_left(self.buckets, duration)] += 1
+        shard.sum += duration
+        shard.count += 1
+
+    def collect(self) -> tuple[dict[tuple[int, str, type[BaseException]], int], list[int], float, int]:
+        """Aggregate all shards into (counts, histogram buckets, duration sum, duration count)."""
+        counts: dict[tuple[int, str, type[BaseException]], int] = {}
+        buckets = [0] * (len(self.buckets) + 1)
+        total, count = 0.0, 0
+
+        with self._lock:
+            shards = list(self._shards)
+
+        for shard in shards:
+            for key, value in dict(shard.counts).items():
+                counts[key] = counts.get(key, 0) + value
+            for i, value in enumerate(list(shard.buckets)):
+                buckets[i] += value
+            total += shard.sum
+            count += shard.count
+
+        return counts, buckets, total, count
+
+    def exposition(self) -> str:
+        """Render the collected metrics in the Prometheus text exposition format."""
+        counts, buckets, total, count = self.collect()
+        problems = f"{self.namespace}_problems_total"
+        duration = f"{self.namespace}_handler_duration_seconds"
+
+        lines = [
+            f"# HELP {problems} Problems rendered by the exception handler.",
+            f"# TYPE {problems} counter",
+        ]
+        for (status, problem_type, exc_type), value in sorted(counts.items(), key=lambda item: item[0][:2]):
+            exception = f"{exc_type.__module__}.{exc_type.__qualname__}"
+            labels = f'status="{status}",type="{_escape(problem_type)}",exception="{_escape(exception)}"'
+            lines.append(f"{problems}{{{labels}}} {value}")
+
+        lines.extend([
+            f"# HELP {duration} Time spent in the exception handler.",
+            f"# TYPE {duration} histogram",
+        ])
+        cumulative = 0
+        for bound, value in zip([*self.buckets, "+Inf"], buckets, strict=True):
+            cumulative += value
+            lines.append(f'{duration}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{duration}_sum {total}")
+        lines.append(f"{duration}_count {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def _new_shard(self) -> _Shard:
+        shard = _Shard(len(self.buckets))
+        with self._lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+
+def metrics_endpoint(metrics: ProblemMetrics) -> t.Callable[[Request], t.Awaitable[Response]]:
+    """Create a Starlette endpoint serving metrics in the Prometheus text format."""
+
+    async def endpoint(_request: Request) -> Response:
+        return Response(metrics.exposition(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    return endpoint
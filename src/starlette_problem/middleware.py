@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import typing as t
+
+from starlette._utils import is_async_callable
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+if t.TYPE_CHECKING:
+    from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+    from starlette_problem.handler import ExceptionHandler
+
+
+async def reraise(_request: Request, exc: Exception) -> t.NoReturn:
+    """Exception handler deferring an exception to the ProblemMiddleware.
+
+    Registered for exceptions Starlette's ExceptionMiddleware would otherwise
+    handle itself, such as HTTPException.
+    """
+    raise exc
+
+
+class ProblemMiddleware:
+    """Pure ASGI middleware rendering exceptions as problem responses.
+
+    Exceptions are caught directly and rendered by the ExceptionHandler,
+    bypassing Starlette's exception middleware. Installed as the innermost
+    user middleware, responses for unhandled exceptions still pass through
+    other middleware such as CORS and GZip.
+
+    If the response has already started the exception is re-raised, as a
+    problem response can no longer be sent.
+    """
+
+    def __init__(self, app: ASGIApp, handler: ExceptionHandler) -> None:
+        self.app = app
+        self.handler = handler
+        self._async = is_async_callable(handler)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            if response_started:
+                raise
+
+            request = Request(scope, receive)
+            if self._async:
+                response = await self.handler(request, exc)
+            else:
+                response = await run_in_threadpool(self.handler, request, exc)
+
+            await response(scope, receive, send)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import typing as t
+
+from starlette.responses import JSONResponse
+
+from starlette_problem.encoder import PROBLEM_JSON, Encoder, json_encoder
+
+if t.TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from starlette.background import BackgroundTask
+
+
+# Constant header shared by all problem responses, encoded once.
+CONTENT_TYPE_HEADER = (b"content-type", PROBLEM_JSON.encode("latin-1"))
+
+
+def raw_problem_headers(headers: Mapping[str, str] | None) -> tuple[tuple[bytes, bytes], ...]:
+    """Raw headers for a problem, the content type followed by the problem's own headers.
+
+    A problem header named `content-type` replaces the default content type.
+    """
+    if not headers:
+        return (CONTENT_TYPE_HEADER,)
+
+    merged = {"content-type": PROBLEM_JSON, **headers}
+    return tuple((k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in merged.items())
+
+
+class ProblemResponse(JSONResponse):
+    media_type = PROBLEM_JSON
+
+    def __init__(  # noqa: PLR0913
+        self,
+        content: t.Any,  # noqa: ANN401
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        media_type: str | None = None,
+        background: BackgroundTask | None = None,
+        *,
+        encoder: Encoder = json_encoder,
+    ) -> None:
+        self.encoder = encoder
+        super().__init__(content, status_code, headers, media_type, background)
+
+    def render(self, content: t.Any) -> bytes:  # noqa: ANN401
+        if isinstance(content, bytes):
+            return content
+        return self.encoder(content)
+
+    @classmethod
+    def from_rendered(
+        cls,
+        status_code: int,
+        body: bytes,
+        raw_headers: t.Iterable[tuple[bytes, bytes]],
+        *,
+        encoder: Encoder = json_encoder,
+    ) -> ProblemResponse:
+        """Build a response around an already encoded body and header list.
+
+        Skips header construction, the raw headers (including content-length)
+        are used as is.
+        """
+        response = cls.__new__(cls)
+        response.encoder = encoder
+        response.status_code = status_code
+        response.background = None
+        response.body = body
+        response.raw_headers = list(raw_headers)
+        return response
@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import dataclasses
+import functools
+import gzip
+import hashlib
 import json
 import typing as t
 
@@ -8,20 +12,60 @@ from rfc9457.openapi import problem_component, problem_response
 from starlette.responses import Response
 from starlette.schemas import SchemaGenerator as SchemaGenerator_
 
+from starlette_problem.encoder import Encoder, get_encoder
+from starlette_problem.util import accepts_encoding
+
 if t.TYPE_CHECKING:
+    from collections.abc import Mapping
+
     from starlette.requests import Request
     from starlette.routing import BaseRoute
 
 
+def schema_encoder(content: dict) -> bytes:
+    """Encode a schema with `json.dumps` defaults, the format openapi.json has always been served in."""
+    return json.dumps(content).encode("utf-8")
+
+
 class OpenAPIJsonResponse(Response):
     media_type = "application/vnd.github.v3+json"
 
-    def render(self, content: dict) -> bytes:
-        return json.dumps(content).encode("utf-8")
+    def __init__(
+        self,
+        content: dict | bytes,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        *,
+        encoder: Encoder = schema_encoder,
+    ) -> None:
+        self.encoder = encoder
+        super().__init__(content, status_code=status_code, headers=headers)
+
+    def render(self, content: dict | bytes) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return self.encoder(content)
+
+
+@dataclasses.dataclass(frozen=True)
+class EncodedSchema:
+    routes: tuple[BaseRoute, ...]
+    body: bytes
+    etag: str
+    gzip_body: bytes | None = None
+    gzip_etag: str | None = None
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header value against an etag, using weak comparison."""
+    if if_none_match.strip() == "*":
+        return True
+
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
 
 
 class SchemaGenerator(SchemaGenerator_):
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         base_schema: dict[str, t.Any],
         *,
@@ -29,12 +73,43 @@ class SchemaGenerator(SchemaGenerator_):
         documentation_uri_template: str = "",
         strict: bool = False,
         generic_defaults: bool = False,
+        encoder: str | Encoder | None = None,
+        gzip: bool = False,
     ) -> None:
         super().__init__(base_schema)
         self.problems = problems or []
         self.documentation_uri_template = documentation_uri_template
         self.strict = strict
         self.generic_defaults = generic_defaults
+        self.encoder = schema_encoder if encoder is None else get_encoder(encoder)
+        self.gzip = gzip
+        self._encoded: EncodedSchema | None = None
+
+    @functools.cached_property
+    def generic_responses(self) -> dict[str, dict[str, t.Any]]:
+        """Generic 4XX/5XX responses, referenced by every operation when `generic_defaults` is enabled."""
+        user_error = Problem(
+            "User facing error message.",
+            type_="client-error-type",
+            status=400,
+            detail="Additional error context.",
+        )
+        server_error = Problem(
+            "User facing error message.",
+            type_="server-error-type",
+            status=500,
+            detail="Additional error context.",
+        )
+        return {
+            "ClientError": problem_response(
+                description="Client Error",
+                examples=[user_error.marshal(uri=self.documentation_uri_template, strict=self.strict)],
+            ),
+            "ServerError": problem_response(
+                description="Server Error",
+                examples=[server_error.marshal(uri=self.documentation_uri_template, strict=self.strict)],
+            ),
+        }
 
     def get_schema(self, routes: list[BaseRoute]) -> dict[str, t.Any]:
         schema = super().get_schema(routes)
@@ -48,33 +123,52 @@ class SchemaGenerator(SchemaGenerator_):
         for problem in self.problems:
             schema["components"]["schemas"][problem.__name__] = problem_component(problem.__name__)
 
-        for methods in schema["paths"].values():
-            for details in methods.values():
-                if self.generic_defaults:
-                    user_error = Problem(
-                        "User facing error message.",
-                        type_="client-error-type",
-                        status=400,
-                        detail="Additional error context.",
-                    )
-                    server_error = Problem(
-                        "User facing error message.",
-                        type_="server-error-type",
-                        status=500,
-                        detail="Additional error context.",
-                    )
-                    details["responses"]["4XX"] = problem_response(
-                        description="Client Error",
-                        examples=[user_error.marshal(uri=self.documentation_uri_template, strict=self.strict)],
-                    )
-                    details["responses"]["5XX"] = problem_response(
-                        description="Server Error",
-                        examples=[server_error.marshal(uri=self.documentation_uri_template, strict=self.strict)],
-                    )
+        if self.generic_defaults:
+            schema["components"].setdefault("responses", {}).update(self.generic_responses)
+            for methods in schema["paths"].values():
+                for details in methods.values():
+                    # Fresh reference objects per operation, shared objects are
+                    # rendered as anchors/aliases in the yaml schema.
+                    details["responses"]["4XX"] = {"$ref": "#/components/responses/ClientError"}
+                    details["responses"]["5XX"] = {"$ref": "#/components/responses/ServerError"}
 
         return schema
 
+    def get_encoded_schema(self, routes: list[BaseRoute]) -> EncodedSchema:
+        """Generate and encode the schema, reusing the previous result if the routes are unchanged."""
+        encoded = self._encoded
+        if encoded is not None and encoded.routes == tuple(routes):
+            return encoded
+
+        body = self.encoder(self.get_schema(routes=routes))
+        digest = hashlib.sha256(body).hexdigest()
+        encoded = EncodedSchema(
+            routes=tuple(routes),
+            body=body,
+            etag=f'"{digest}"',
+            gzip_body=gzip.compress(body, mtime=0) if self.gzip else None,
+            gzip_etag=f'"{digest}-gzip"' if self.gzip else None,
+        )
+        self._encoded = encoded
+        return encoded
+
+    def clear_cache(self) -> None:
+        self._encoded = None
+
     def OpenAPIJsonResponse(self, request: Request) -> Response:  # noqa: N802
-        routes = request.app.routes
-        schema = self.get_schema(routes=routes)
-        return OpenAPIJsonResponse(schema)
+        encoded = self.get_encoded_schema(request.app.routes)
+
+        body, etag, headers = encoded.body, encoded.etag, {}
+        if encoded.gzip_body is not None:
+            headers["vary"] = "Accept-Encoding"
+            if accepts_encoding(request.headers.get("accept-encoding", ""), "gzip"):
+                body, etag = encoded.gzip_body, encoded.gzip_etag
+                headers["content-encoding"] = "gzip"
+        headers["etag"] = etag
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            headers.pop("content-encoding", None)
+            return Response(status_code=304, headers=headers)
+
+        return OpenAPIJsonResponse(body, headers=headers, encoder=self.encoder)
@@ -1,11 +1,150 @@
 from __future__ import annotations
 
+import collections
+import functools
 import http
+import typing as t
 
+if t.TYPE_CHECKING:
+    import rfc9457
 
-def convert_status_code(status_code: int) -> tuple[str, str]:
-    """Convert an HTTP status code into a (title, type)."""
-    title = http.HTTPStatus(status_code).phrase
-    type_ = "-".join(title.lower().split())
 
-    return title, f"http-{type_}"
+T = t.TypeVar("T")
+
+
+class StatusCode(t.NamedTuple):
+    title: str
+    type: str
+
+
+def _status_code(title: str) -> StatusCode:
+    return StatusCode(title, "http-" + "-".join(title.lower().split()))
+
+
+# Built once at import, so converting a status code never allocates.
+STATUS_CODES: dict[int, StatusCode] = {status.value: _status_code(status.phrase) for status in http.HTTPStatus}
+
+# Fallbacks for non standard status codes, by status class.
+STATUS_FAMILIES: dict[int, StatusCode] = {
+    1: _status_code("Informational"),
+    2: _status_code("Success"),
+    3: _status_code("Redirection"),
+    4: _status_code("Client Error"),
+    5: _status_code("Server Error"),
+}
+
+
+def register_status_code(status_code: int, title: str, type_: str | None = None) -> None:
+    """Register a custom, or non standard, status code (499, 599 etc)."""
+    if status_code // 100 not in STATUS_FAMILIES:
+        msg = f"{status_code} is not a valid HTTP status code"
+        raise ValueError(msg)
+
+    STATUS_CODES[status_code] = _status_code(title) if type_ is None else StatusCode(title, type_)
+
+
+def convert_status_code(status_code: int) -> StatusCode:
+    """Convert an HTTP status code into a (title, type).
+
+    Unregistered status codes are converted using their status class, a 499
+    converts to ("Client Error", "http-client-error") for example.
+    """
+    try:
+        return STATUS_CODES[status_code]
+    except KeyError:
+        pass
+
+    try:
+        return STATUS_FAMILIES[status_code // 100]
+    except KeyError:
+        msg = f"{status_code} is not a valid HTTP status code"
+        raise ValueError(msg) from None
+
+
+def status_table(mapping: t.Mapping[str | int, T]) -> dict[int, T]:
+    """Resolve a mapping keyed by status codes and families ("4xx") into a flat table.
+
+    Exact status codes take precedence over families, non status keys such as
+    "default" are ignored.
+    """
+    table = {}
+    for key, value in mapping.items():
+        key_ = str(key).lower()
+        if len(key_) == 3 and key_[0].isdigit() and key_[1:] == "xx":  # noqa: PLR2004
+            family = int(key_[0]) * 100
+            for status_code in range(family, family + 100):
+                table.setdefault(status_code, value)
+
+    for key, value in mapping.items():
+        if isinstance(key, int) or key.isdigit():
+            table[int(key)] = value
+
+    return table
+
+
+@functools.lru_cache(maxsize=256)
+def _quality(params: str) -> float:
+    """Parse the quality value from header parameters, defaulting to 1."""
+    quality = 1.0
+    for param in params.split(";"):
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+    return quality
+
+
+def accepts_encoding(accept_encoding: str, coding: str) -> bool:
+    """Check if an Accept-Encoding header value allows a content coding."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        accepted[name.strip().lower()] = _quality(params) > 0
+
+    return accepted.get(coding, accepted.get("*", False))
+
+
+def negotiate_media_type(accept: str, offered: t.Sequence[str]) -> str | None:
+    """Select the offered media type most preferred by an Accept header value.
+
+    The most specific matching media range determines the quality of each
+    offered type, ties are resolved in offered order. Returns None if no
+    offered type is acceptable.
+    """
+    ranges = []
+    for part in accept.split(","):
+        media_range, _, params = part.partition(";")
+        ranges.append((media_range.strip().lower(), _quality(params)))
+
+    best, best_quality = None, 0.0
+    for media_type in offered:
+        wildcard = media_type.partition("/")[0] + "/*"
+        quality, specificity = 0.0, -1
+        for media_range, q in ranges:
+            match = {media_type: 2, wildcard: 1, "*/*": 0}.get(media_range, -1)
+            if match > specificity:
+                quality, specificity = q, match
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+
+    return best
+
+
+def fingerprint(exc: BaseException, problem: rfc9457.Problem, frames: int = 3) -> str:
+    """Generate a stable fingerprint for an exception occurrence.
+
+    Built from the exception class, problem type, and the innermost frames of
+    the traceback, so repeated failures at the same location share a fingerprint.
+    """
+    # Only needed by log sampling and exporting, keep them off the import path.
+    import hashlib  # noqa: PLC0415
+    import traceback  # noqa: PLC0415
+
+    exc_type = type(exc)
+    parts = [f"{exc_type.__module__}.{exc_type.__qualname__}", problem.type]
+    for frame, lineno in collections.deque(traceback.walk_tb(exc.__traceback__), maxlen=frames):
+        parts.append(f"{frame.f_code.co_filename}:{frame.f_code.co_name}:{lineno}")
+
+    return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=8).hexdigest()
@@ -72,3 +72,9 @@ def tests(context):
 def tests_coverage(context):
     """Run pytest unit tests with coverage."""
     context.run("pytest --cov -x --cov-report=xml")
+
+
+@invoke.task
+def benchmark(context, save=False):  # noqa: FBT002
+    """Run benchmarks, comparing against (or saving) the stored baseline."""
+    context.run(f"python benchmarks/run.py{' --save' if save else ''}")
@@ -0,0 +1,77 @@
+from starlette_problem import cache, error
+
+
+def rendered(body=b"{}"):
+    return cache.RenderedProblem(status=404, content={}, body=body, raw_headers=())
+
+
+def test_key_includes_problem_details():
+    a = error.NotFoundProblem("a")
+    b = error.NotFoundProblem("b")
+
+    assert cache.ResponseCache.key(a) == cache.ResponseCache.key(error.NotFoundProblem("a"))
+    assert cache.ResponseCache.key(a) != cache.ResponseCache.key(b)
+
+
+def test_key_includes_headers():
+    a = error.NotFoundProblem("a", headers={"x-header": "a"})
+    b = error.NotFoundProblem("a", headers={"x-header": "b"})
+
+    assert cache.ResponseCache.key(a) != cache.ResponseCache.key(b)
+
+
+def test_key_skips_problems_with_extras():
+    assert cache.ResponseCache.key(error.NotFoundProblem("a", extra="value")) is None
+
+
+def test_hits_and_misses():
+    c = cache.ResponseCache()
+
+    assert c.get("key") is None
+    c.set("key", rendered())
+    assert c.get("key") == rendered()
+
+    assert (c.hits, c.misses) == (1, 1)
+
+
+def test_least_recently_used_evicted():
+    c = cache.ResponseCache(max_entries=2)
+
+    c.set("a", rendered())
+    c.set("b", rendered())
+    c.get("a")
+    c.set("c", rendered())
+
+    assert c.get("a") is not None
+    assert c.get("b") is None
+    assert list(c._entries) == ["c", "a"]
+
+
+def test_evicted_to_fit_max_bytes():
+    c = cache.ResponseCache(max_bytes=10)
+
+    c.set("a", rendered(b"12345"))
+    c.set("b", rendered(b"12345"))
+    c.set("c", rendered(b"12345"))
+
+    assert c.get("a") is None
+    assert (len(c), c.size) == (2, 10)
+
+
+def test_oversized_entry_not_cached():
+    c = cache.ResponseCache(max_bytes=4)
+
+    c.set("a", rendered(b"12345"))
+
+    assert c.get("a") is None
+    assert c.size == 0
+
+
+def test_clear():
+    c = cache.ResponseCache()
+    c.set("a", rendered())
+
+    c.clear()
+
+    assert len(c) == 0
+    assert c.size == 0
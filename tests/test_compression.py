@@ -0,0 +1,23 @@
+import gzip
+
+from starlette_problem import compression
+
+BODY = b'{"type":"server-problem","title":"Server error.","status":500}' * 100
+
+
+def test_gzip_compress():
+    compressed = compression.gzip_compress(BODY)
+
+    assert gzip.decompress(compressed) == BODY
+    assert compressed == compression.gzip_compress(BODY)
+    assert len(compressed) < len(BODY)
+
+
+async def test_gzip_stream():
+    async def chunks():
+        for i in range(0, len(BODY), 1000):
+            yield BODY[i : i + 1000]
+
+    compressed = b"".join([chunk async for chunk in compression.gzip_stream(chunks())])
+
+    assert gzip.decompress(compressed) == BODY
@@ -0,0 +1,179 @@
+import dataclasses
+import datetime as dt
+import enum
+import json
+import math
+import uuid
+from unittest import mock
+
+import pytest
+
+from starlette_problem import encoder, error
+
+PAYLOADS = [
+    error.NotFoundProblem("Not Found").marshal(),
+    error.UnprocessableProblem(
+        "Request validation failed.",
+        errors=[{"loc": ["body", "items", i, "name"], "msg": "field required", "type": "missing"} for i in range(50)],
+    ).marshal(),
+    error.ServerProblem("Ünïcödé détail ✓", trace_id="abc", retryable=False, attempt=3, cause=None).marshal(),
+    {200: {"description": "int keys"}, "nested": {"list": [1, 2.5, True, None]}},
+]
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_json_encoder_matches_json_response(payload):
+    from starlette.responses import JSONResponse  # noqa: PLC0415
+
+    assert encoder.json_encoder(payload) == JSONResponse(payload).body
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_orjson_encoder_matches_json_encoder(payload):
+    pytest.importorskip("orjson")
+
+    assert encoder.orjson_encoder(payload) == encoder.json_encoder(payload)
+
+
+def test_orjson_encoder_falls_back_for_unsupported_content():
+    pytest.importorskip("orjson")
+    payload = {"big": 2**70}
+
+    assert encoder.orjson_encoder(payload) == encoder.json_encoder(payload)
+    assert json.loads(encoder.orjson_encoder(payload)) == payload
+
+
+def test_get_encoder_auto_prefers_orjson():
+    pytest.importorskip("orjson")
+
+    assert encoder.get_encoder() is encoder.orjson_encoder
+
+
+def test_get_encoder_auto_falls_back_to_json():
+    with mock.patch.object(encoder, "_import_orjson", return_value=None):
+        assert encoder.get_encoder() is encoder.json_encoder
+
+
+def test_get_encoder_orjson_not_installed():
+    with mock.patch.object(encoder, "_import_orjson", return_value=None), pytest.raises(ImportError):
+        encoder.get_encoder("orjson")
+
+
+def test_get_encoder_named():
+    assert encoder.get_encoder("json") is encoder.json_encoder
+
+
+def test_get_encoder_callable():
+    def custom(_content):
+        return b""
+
+    assert encoder.get_encoder(custom) is custom
+
+
+def test_get_encoder_unknown():
+    with pytest.raises(ValueError, match="Unknown encoder 'yaml'"):
+        encoder.get_encoder("yaml")
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+@pytest.mark.parametrize("chunk_size", [1, 64, 64 * 1024])
+def test_iter_encode_matches_json_encoder(payload, chunk_size):
+    assert b"".join(encoder.iter_encode(payload, chunk_size=chunk_size)) == encoder.json_encoder(payload)
+
+
+def test_iter_encode_chunks():
+    payload = PAYLOADS[1]
+
+    chunks = list(encoder.iter_encode(payload, chunk_size=256))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) >= 256 for chunk in chunks[:-1])  # noqa: PLR2004
+
+
+@pytest.mark.parametrize(
+    ("name", "module", "media_type"),
+    [
+        ("msgpack", "msgpack", "application/problem+msgpack"),
+        ("cbor", "cbor2", "application/problem+cbor"),
+    ],
+)
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_get_format_round_trip(name, module, media_type, payload):
+    backend = pytest.importorskip(module)
+
+    format_media_type, format_encoder = encoder.get_format(name)
+
+    assert format_media_type == media_type
+    decode = backend.unpackb if module == "msgpack" else backend.loads
+    kwargs = {"strict_map_key": False} if module == "msgpack" else {}
+    assert decode(format_encoder(payload), **kwargs) == payload
+
+
+def test_get_format_invalid():
+    with pytest.raises(ValueError, match=r"Unknown format 'xml', expected one of \['msgpack', 'cbor'\]."):
+        encoder.get_format("xml")
+
+
+def test_get_format_not_installed():
+    with (
+        mock.patch.dict("sys.modules", {"cbor2": None}),
+        pytest.raises(ImportError, match=r"The cbor format requires cbor2 to be installed\."),
+    ):
+        encoder.get_format("cbor")
+
+
+class Color(enum.Enum):
+    RED = "red"
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+
+
+@pytest.mark.parametrize(
+    ("payload", "exception"),
+    [
+        ({"at": dt.datetime(2024, 1, 1, tzinfo=dt.timezone.utc)}, TypeError),
+        ({"point": Point(1)}, TypeError),
+        ({(1, 2): "tuple key"}, TypeError),
+    ],
+)
+def test_orjson_encoder_rejects_like_json_encoder(payload, exception):
+    pytest.importorskip("orjson")
+
+    with pytest.raises(exception):
+        encoder.json_encoder(payload)
+    with pytest.raises(exception):
+        encoder.orjson_encoder(payload)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"tuple": (1, 2)},
+        {1.5: "float key", True: "bool key", None: "none key"},
+        {"subclass": type("Name", (str,), {})("value")},
+        {"large": 2**70},
+        {1: "int key", "nested": {2: [3]}},
+    ],
+)
+def test_orjson_encoder_matches_json_encoder_fallback(payload):
+    pytest.importorskip("orjson")
+
+    assert encoder.orjson_encoder(payload) == encoder.json_encoder(payload)
+
+
+@pytest.mark.parametrize(
+    ("payload", "expected"),
+    [
+        ({"a": math.nan}, b'{"a":null}'),
+        ({"a": [math.inf]}, b'{"a":[null]}'),
+        ({"id": uuid.UUID(int=0)}, b'{"id":"00000000-0000-0000-0000-000000000000"}'),
+        ({"color": Color.RED}, b'{"color":"red"}'),
+    ],
+)
+def test_orjson_encoder_documented_differences(payload, expected):
+    pytest.importorskip("orjson")
+
+    assert encoder.orjson_encoder(payload) == expected
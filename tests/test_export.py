@@ -0,0 +1,212 @@
+import json
+from unittest import mock
+
+import anyio
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.routing import Route
+
+from starlette_problem import error, export, handler, util
+
+
+class MemoryTransport:
+    def __init__(self, delay=0):
+        self.batches = []
+        self.delay = delay
+        self.sent = anyio.Event()
+
+    async def send(self, events):
+        await anyio.sleep(self.delay)
+        self.batches.append(events)
+        self.sent.set()
+
+
+class FailingTransport:
+    async def send(self, _events):
+        msg = "collector unavailable"
+        raise ConnectionError(msg)
+
+
+async def endpoint(_request):
+    raise RuntimeError
+
+
+ROUTE = Route("/items/{item_id}", endpoint)
+
+
+def request():
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/items/123",
+        "query_string": b"",
+        "headers": [],
+        "route": ROUTE,
+    })
+
+
+def raise_error():
+    try:
+        msg = "Something went bad"
+        raise RuntimeError(msg)  # noqa: TRY301
+    except RuntimeError as e:
+        return e
+
+
+def record(exporter, count=1, problem=None):
+    for _ in range(count):
+        exc = raise_error()
+        exporter.record(request(), exc, problem or error.ServerProblem("Server error."))
+
+
+def test_record():
+    exporter = export.ProblemExporter(MemoryTransport())
+    exc = raise_error()
+    problem = error.ServerProblem("Server error.")
+
+    with mock.patch("linecache.checkcache") as checkcache, mock.patch("linecache.getline") as getline:
+        exporter.record(request(), exc, problem)
+
+    assert (checkcache.call_count, getline.call_count) == (0, 0)
+    [event] = exporter._buffer
+    assert event["type"] == "server-problem"
+    assert event["status"] == problem.status
+    assert event["fingerprint"] == util.fingerprint(exc, problem)
+    assert event["route"] == "/items/{item_id}"
+    assert event["exception"] == "builtins.RuntimeError"
+    assert event["traceback"] == [(__file__, exc.__traceback__.tb_lineno, "raise_error")]
+    assert isinstance(event["timestamp"], float)
+
+
+async def test_flush_formats_tracebacks():
+    transport = MemoryTransport()
+    exporter = export.ProblemExporter(transport)
+    record(exporter)
+
+    await exporter.flush()
+
+    [[event]] = transport.batches
+    assert event["traceback"].startswith(f'  File "{__file__}", line ')
+    assert "raise RuntimeError(msg)" in event["traceback"]
+
+
+def test_record_ignores_client_errors():
+    exporter = export.ProblemExporter(MemoryTransport())
+
+    record(exporter, problem=error.NotFoundProblem("Not found."))
+
+    assert len(exporter) == 0
+
+
+@pytest.mark.parametrize(("drop", "last_status"), [("oldest", 502), ("newest", 501)])
+def test_record_drop_policy(drop, last_status):
+    exporter = export.ProblemExporter(MemoryTransport(), max_buffer=2, drop=drop)
+
+    for status in (500, 501, 502):
+        problem = error.Problem("Server error.", status=status)
+        exporter.record(request(), raise_error(), problem)
+
+    assert len(exporter) == len([500, 501])
+    assert exporter.dropped == 1
+    assert exporter._buffer[-1]["status"] == last_status
+
+
+def test_invalid_drop_policy():
+    with pytest.raises(ValueError, match="Unknown drop policy 'all'"):
+        export.ProblemExporter(MemoryTransport(), drop="all")
+
+
+async def test_flush_batches():
+    transport = MemoryTransport()
+    exporter = export.ProblemExporter(transport, batch_size=2)
+    record(exporter, 5)
+
+    await exporter.flush()
+
+    assert [len(batch) for batch in transport.batches] == [2, 2, 1]
+    assert (exporter.exported, len(exporter)) == (5, 0)
+
+
+async def test_flush_transport_failure():
+    exporter = export.ProblemExporter(FailingTransport(), batch_size=2)
+    record(exporter, 3)
+
+    await exporter.flush()
+
+    assert (exporter.failed, exporter.exported, len(exporter)) == (3, 0, 0)
+
+
+async def test_run_flushes_by_size():
+    transport = MemoryTransport()
+    exporter = export.ProblemExporter(transport, batch_size=2, flush_interval=60)
+
+    with anyio.fail_after(1):
+        async with exporter.running():
+            record(exporter, 2)
+            await transport.sent.wait()
+
+    assert [len(batch) for batch in transport.batches] == [2]
+
+
+async def test_run_flushes_by_time():
+    transport = MemoryTransport()
+    exporter = export.ProblemExporter(transport, batch_size=100, flush_interval=0.05)
+
+    with anyio.fail_after(1):
+        async with exporter.running():
+            record(exporter)
+            await transport.sent.wait()
+
+    assert [len(batch) for batch in transport.batches] == [1]
+
+
+async def test_running_flushes_on_exit():
+    transport = MemoryTransport()
+    exporter = export.ProblemExporter(transport, flush_interval=60)
+
+    async with exporter.running():
+        record(exporter, 3)
+
+    assert [len(batch) for batch in transport.batches] == [3]
+
+
+async def test_cancelled_send_is_retried_on_exit():
+    transport = MemoryTransport(delay=0.5)
+    exporter = export.ProblemExporter(transport, batch_size=1, flush_interval=60)
+
+    with anyio.fail_after(2):
+        async with exporter.running():
+            record(exporter)
+            await anyio.sleep(0.2)
+
+    assert [len(batch) for batch in transport.batches] == [1]
+    assert exporter.exported == 1
+
+
+async def test_file_transport(tmp_path):
+    path = tmp_path / "problems.jsonl"
+    transport = export.FileTransport(path)
+
+    await transport.send([{"type": "a"}, {"type": "b"}])
+    await transport.send([{"type": "c"}])
+
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [{"type": "a"}, {"type": "b"}, {"type": "c"}]
+
+
+async def test_exporter_in_app(tmp_path):
+    path = tmp_path / "problems.jsonl"
+    exporter = export.ProblemExporter(export.FileTransport(path), flush_interval=60)
+    app = Starlette(routes=[ROUTE])
+    handler.add_exception_handler(app, exporter=exporter)
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    async with app.router.lifespan_context(app):
+        await client.get("/items/123")
+        await client.get("/missing")
+
+    [event] = [json.loads(line) for line in path.read_text().splitlines()]
+    assert (event["route"], event["status"], event["type"]) == ("/items/{item_id}", 500, "unhandled-exception")
@@ -1,13 +1,20 @@
+import gzip
 import http
 import json
+import logging
 from unittest import mock
 
+import anyio
+import anyio.lowlevel
 import httpx
 import pytest
 from starlette.applications import Starlette
 from starlette.exceptions import HTTPException
+from starlette.middleware import cors as cors_middleware
+from starlette.responses import JSONResponse
+from starlette.routing import Route
 
-from starlette_problem import error, handler
+from starlette_problem import cache, compression, encoder, error, handler, log
 from starlette_problem.cors import CorsConfiguration
 
 
@@ -62,6 +69,39 @@ class TestExceptionHandler:
             exc_info=(type(exc), exc, None),
         )
 
+    def test_queue_logger(self):
+        logger = logging.getLogger("starlette_problem.tests.handler")
+        queue_logger = log.QueueLogger(logger)
+
+        request = mock.Mock()
+        exc = Exception("Something went bad")
+
+        eh = handler.ExceptionHandler(logger=queue_logger)
+        with mock.patch.object(logger, "handle") as handle:
+            eh(request, exc)
+            queue_logger.close()
+
+        record = handle.call_args[0][0]
+        assert record.getMessage() == "Unhandled exception occurred."
+        assert record.exc_info == (type(exc), exc, None)
+
+    def test_log_sampler(self):
+        logger = mock.Mock()
+        request = mock.Mock()
+
+        def raise_error():
+            try:
+                msg = "Something went bad"
+                raise RuntimeError(msg)  # noqa: TRY301
+            except RuntimeError as e:
+                return e
+
+        eh = handler.ExceptionHandler(logger=logger, log_sampler=log.LogSampler(limit=2))
+        for _ in range(5):
+            eh(request, raise_error())
+
+        assert logger.exception.call_count == len(["first", "second"])
+
     def test_documentation_uri_template(self):
         request = mock.Mock()
         exc = Exception("Something went bad")
@@ -217,6 +257,69 @@ class TestExceptionHandler:
             == b'{"type":"something-wrong","title":"This is an error.","status":500,"a":"b","detail":"something bad"}'
         )
 
+    @pytest.mark.parametrize(
+        ("rules", "stripped"),
+        [
+            (["5xx"], True),
+            (["5XX"], True),
+            (["4xx"], False),
+            (["500"], True),
+            (["type:something-wrong"], True),
+            (["type:other", 404], False),
+        ],
+    )
+    def test_strip_extras_post_hook_include_rules(self, rules, stripped):
+        request = mock.Mock(headers={})
+        exc = SomethingWrongError("something bad", a="b")
+
+        eh = handler.ExceptionHandler(
+            post_hooks=[handler.StripExtrasPostHook(include=rules, enabled=True)],
+        )
+        response = eh(request, exc)
+
+        assert ("a" not in json.loads(response.body)) is stripped
+
+    def test_strip_extras_post_hook_exclude_family(self):
+        request = mock.Mock(headers={})
+        exc = SomethingWrongError("something bad", a="b")
+
+        eh = handler.ExceptionHandler(
+            post_hooks=[handler.StripExtrasPostHook(exclude=["5xx"], enabled=True)],
+        )
+        response = eh(request, exc)
+
+        assert json.loads(response.body)["a"] == "b"
+
+    @pytest.mark.parametrize("rule", ["5x", "abc", "x5xx", ""])
+    def test_strip_extras_post_hook_invalid_rule(self, rule):
+        with pytest.raises(ValueError, match="Invalid rule"):
+            handler.StripExtrasPostHook(include=[rule], enabled=True)
+
+    def test_strip_extras_post_hook_memoizes_decision(self):
+        hook = handler.StripExtrasPostHook(exclude=[404], enabled=True)
+        content = {"type": "something-wrong", "title": "This is an error.", "status": 500, "a": "b"}
+
+        for _ in range(3):
+            hook.process_content(content, mock.Mock(), 500, mock.Mock())
+
+        info = hook._should_strip.cache_info()
+        assert (info.hits, info.misses) == (2, 1)
+
+    def test_strip_extras_post_hook_uses_handler_encoder(self):
+        request = mock.Mock(headers={})
+        exc = SomethingWrongError("something bad", a="b")
+
+        eh = handler.ExceptionHandler(
+            post_hooks=[handler.StripExtrasPostHook(enabled=True)],
+            encoder=lambda content: json.dumps(content, sort_keys=True).encode(),
+        )
+        response = eh(request, exc)
+
+        assert (
+            response.body
+            == b'{"detail": "something bad", "status": 500, "title": "This is an error.", "type": "something-wrong"}'
+        )
+
     def test_strip_extras_post_hook_custom_mandatory(self):
         request = mock.Mock(headers={})
         exc = SomethingWrongError("something bad", a="b")
@@ -309,6 +412,103 @@ class TestExceptionHandler:
             "status": 400,
         }
 
+    def test_error_handler_precedence_follows_registration_order(self):
+        def base_handler(_eh, _request, exc):
+            return error.Problem(title="Base", detail=str(exc), status=400)
+
+        def specific_handler(_eh, _request, exc):
+            return error.Problem(title="Specific", detail=str(exc), status=409)
+
+        request = mock.Mock()
+        exc = RuntimeError("Something went bad")
+
+        eh = handler.ExceptionHandler(handlers={Exception: base_handler, RuntimeError: specific_handler})
+        response = eh(request, exc)
+
+        assert response.status_code == http.HTTPStatus.BAD_REQUEST
+
+    def test_error_handler_dispatch_is_memoized(self):
+        def handler_(_eh, _request, exc):
+            return error.Problem(title="Handled", detail=str(exc), status=400)
+
+        request = mock.Mock()
+
+        eh = handler.ExceptionHandler(handlers={RuntimeError: handler_})
+        eh(request, RuntimeError("first"))
+        eh(request, RuntimeError("second"))
+        eh(request, ValueError("third"))
+
+        info = eh._dispatch.cache_info()
+        assert (info.hits, info.misses) == (1, 2)
+
+    @pytest.mark.parametrize(
+        "mutate",
+        [
+            lambda handlers, h: handlers.__setitem__(RuntimeError, h),
+            lambda handlers, h: handlers.update({RuntimeError: h}),
+            lambda handlers, h: handlers.setdefault(RuntimeError, h),
+        ],
+    )
+    def test_error_handler_dispatch_invalidated_on_add(self, mutate):
+        def handler_(_eh, _request, exc):
+            return error.Problem(title="Handled", detail=str(exc), status=400)
+
+        request = mock.Mock()
+        exc = RuntimeError("Something went bad")
+
+        eh = handler.ExceptionHandler()
+        assert eh(request, exc).status_code == http.HTTPStatus.INTERNAL_SERVER_ERROR
+
+        mutate(eh.handlers, handler_)
+
+        assert eh(request, exc).status_code == http.HTTPStatus.BAD_REQUEST
+
+    def test_error_handler_dispatch_invalidated_on_remove(self):
+        def handler_(_eh, _request, exc):
+            return error.Problem(title="Handled", detail=str(exc), status=400)
+
+        request = mock.Mock()
+        exc = RuntimeError("Something went bad")
+
+        eh = handler.ExceptionHandler(handlers={RuntimeError: handler_})
+        assert eh(request, exc).status_code == http.HTTPStatus.BAD_REQUEST
+
+        del eh.handlers[RuntimeError]
+
+        assert eh(request, exc).status_code == http.HTTPStatus.INTERNAL_SERVER_ERROR
+
+    def test_error_handler_setdefault_optional_default(self):
+        def handler_(_eh, _request, exc):
+            return error.Problem(title="Handled", detail=str(exc), status=400)
+
+        eh = handler.ExceptionHandler(handlers={RuntimeError: handler_})
+
+        assert eh.handlers.setdefault(RuntimeError) is handler_
+
+    def test_error_handler_handlers_copied(self):
+        def handler_(_eh, _request, exc):
+            return error.Problem(title="Handled", detail=str(exc), status=400)
+
+        handlers = {}
+        eh = handler.ExceptionHandler(handlers=handlers)
+        handlers[RuntimeError] = handler_
+
+        assert eh(mock.Mock(), RuntimeError("Something went bad")).status_code == http.HTTPStatus.INTERNAL_SERVER_ERROR
+
+    def test_error_handler_dispatch_invalidated_on_replace(self):
+        def handler_(_eh, _request, exc):
+            return error.Problem(title="Handled", detail=str(exc), status=400)
+
+        request = mock.Mock()
+        exc = RuntimeError("Something went bad")
+
+        eh = handler.ExceptionHandler()
+        assert eh(request, exc).status_code == http.HTTPStatus.INTERNAL_SERVER_ERROR
+
+        eh.handlers = {RuntimeError: handler_}
+
+        assert eh(request, exc).status_code == http.HTTPStatus.BAD_REQUEST
+
     def test_error_handler_pass(self):
         logger = mock.Mock()
 
@@ -366,6 +566,126 @@ class TestExceptionHandler:
             "status": 500,
         }
 
+    @pytest.mark.parametrize("encoder", ["json", "orjson"])
+    def test_encoder(self, encoder):
+        pytest.importorskip(encoder)
+        request = mock.Mock()
+        exc = SomethingWrongError("something bad ✓", a=["b"])
+
+        eh = handler.ExceptionHandler(encoder=encoder)
+        response = eh(request, exc)
+
+        assert (
+            response.body
+            == (
+                '{"type":"something-wrong","title":"This is an error.","status":500,"a":["b"],"detail":"something bad ✓"}'
+            ).encode()
+        )
+
+    def test_single_pass_encodes_once(self, cors):
+        request = mock.Mock(headers={"origin": "localhost"})
+        exc = SomethingWrongError("something bad", a="b")
+        encoder_ = mock.Mock(side_effect=encoder.json_encoder)
+
+        eh = handler.ExceptionHandler(
+            post_hooks=[handler.CorsPostHook(cors), handler.StripExtrasPostHook(enabled=True)],
+            encoder=encoder_,
+            single_pass=True,
+        )
+        response = eh(request, exc)
+
+        assert encoder_.call_count == 1
+        assert (
+            response.body
+            == b'{"type":"something-wrong","title":"This is an error.","status":500,"detail":"something bad"}'
+        )
+        assert response.headers["content-length"] == "92"
+        assert response.headers["access-control-allow-origin"] == "*"
+
+    @pytest.mark.parametrize("origin", ["localhost", "localhost2"])
+    def test_single_pass_matches_default(self, cors, origin):
+        request = mock.Mock(headers={"origin": origin, "cookie": "something"})
+        exc = SomethingWrongError("something bad", a="b")
+        cors.allow_origins = ["localhost"]
+
+        def post_hooks():
+            return [handler.CorsPostHook(cors), handler.StripExtrasPostHook(mandatory_fields=["type"], enabled=True)]
+
+        default = handler.ExceptionHandler(post_hooks=post_hooks())(request, exc)
+        single_pass = handler.ExceptionHandler(post_hooks=post_hooks(), single_pass=True)(request, exc)
+
+        assert single_pass.body == default.body
+        assert sorted(single_pass.raw_headers) == sorted(default.raw_headers)
+
+    def test_single_pass_supports_legacy_hooks(self):
+        def legacy_hook(content, _request, response):
+            content["legacy"] = True
+            response.headers["x-legacy"] = "called"
+            response.body = response.render(content)
+            return content, response
+
+        request = mock.Mock(headers={})
+        exc = SomethingWrongError("something bad", a="b")
+
+        eh = handler.ExceptionHandler(
+            post_hooks=[legacy_hook, handler.StripExtrasPostHook(mandatory_fields=["type"], enabled=True)],
+            single_pass=True,
+        )
+        response = eh(request, exc)
+
+        assert response.body == b'{"type":"something-wrong","legacy":true}'
+        assert response.headers["content-length"] == "40"
+        assert response.headers["x-legacy"] == "called"
+
+    def test_response_cache_reuses_render(self):
+        request = mock.Mock()
+        response_cache = cache.ResponseCache()
+
+        eh = handler.ExceptionHandler(
+            handlers={HTTPException: handler.http_exception_handler_},
+            response_cache=response_cache,
+        )
+        first = eh(request, HTTPException(404))
+        second = eh(request, HTTPException(404))
+
+        assert second.body is first.body
+        assert second.raw_headers == first.raw_headers
+        assert second.raw_headers is not first.raw_headers
+        assert (response_cache.hits, response_cache.misses) == (1, 1)
+
+    def test_response_cache_post_hooks_run_on_hit(self):
+        def post_hook(content, _request, response):
+            content["extra"] = "value"
+            response.headers["x-hook"] = "called"
+            return content, response
+
+        request = mock.Mock(headers={})
+        response_cache = cache.ResponseCache()
+
+        eh = handler.ExceptionHandler(
+            handlers={HTTPException: handler.http_exception_handler_},
+            post_hooks=[post_hook, handler.StripExtrasPostHook(mandatory_fields=["type", "status"], enabled=True)],
+            response_cache=response_cache,
+        )
+        eh(request, HTTPException(404))
+        response = eh(request, HTTPException(404))
+
+        assert response_cache.hits == 1
+        assert response.headers["x-hook"] == "called"
+        assert response.body == b'{"type":"http-not-found","status":404}'
+        assert response.headers["content-length"] == "38"
+
+    def test_response_cache_skips_extras(self):
+        request = mock.Mock()
+        response_cache = cache.ResponseCache()
+
+        eh = handler.ExceptionHandler(response_cache=response_cache)
+        eh(request, SomethingWrongError("something bad", a="b"))
+        eh(request, SomethingWrongError("something bad", a="b"))
+
+        assert (response_cache.hits, response_cache.misses) == (0, 0)
+        assert len(response_cache) == 0
+
     def test_known_error(self):
         request = mock.Mock()
         exc = SomethingWrongError("something bad")
@@ -381,7 +701,7 @@ class TestExceptionHandler:
             "status": 500,
         }
 
-    def test_error_with_no_origin(self, cors):
+    async def test_error_with_no_origin(self, cors):
         app = Starlette()
         request = mock.Mock(headers={})
         exc = SomethingWrongError("something bad")
@@ -390,11 +710,11 @@ class TestExceptionHandler:
             app=app,
             cors=cors,
         )
-        response = eh(request, exc)
+        response = await eh(request, exc)
 
         assert "access-control-allow-origin" not in response.headers
 
-    def test_error_with_origin(self, cors):
+    async def test_error_with_origin(self, cors):
         app = Starlette()
         request = mock.Mock(headers={"origin": "localhost"})
         exc = SomethingWrongError("something bad")
@@ -403,12 +723,12 @@ class TestExceptionHandler:
             app=app,
             cors=cors,
         )
-        response = eh(request, exc)
+        response = await eh(request, exc)
 
         assert "access-control-allow-origin" in response.headers
         assert response.headers["access-control-allow-origin"] == "*"
 
-    def test_error_with_origin_and_cookie(self, cors):
+    async def test_error_with_origin_and_cookie(self, cors):
         app = Starlette()
         request = mock.Mock(headers={"origin": "localhost", "cookie": "something"})
         exc = SomethingWrongError("something bad")
@@ -417,12 +737,12 @@ class TestExceptionHandler:
             app=app,
             cors=cors,
         )
-        response = eh(request, exc)
+        response = await eh(request, exc)
 
         assert "access-control-allow-origin" in response.headers
         assert response.headers["access-control-allow-origin"] == "localhost"
 
-    def test_missing_token_with_origin_limited_origins(self, cors):
+    async def test_missing_token_with_origin_limited_origins(self, cors):
         app = Starlette()
         request = mock.Mock(headers={"origin": "localhost", "cookie": "something"})
         exc = SomethingWrongError("something bad")
@@ -433,13 +753,13 @@ class TestExceptionHandler:
             app=app,
             cors=cors,
         )
-        response = eh(request, exc)
+        response = await eh(request, exc)
 
         assert "access-control-allow-origin" in response.headers
         assert response.headers["vary"] == "Origin"
         assert response.headers["access-control-allow-origin"] == "localhost"
 
-    def test_missing_token_with_origin_limited_origins_no_match(self, cors):
+    async def test_missing_token_with_origin_limited_origins_no_match(self, cors):
         app = Starlette()
         request = mock.Mock(headers={"origin": "localhost2", "cookie": "something"})
         exc = SomethingWrongError("something bad")
@@ -450,10 +770,52 @@ class TestExceptionHandler:
             app=app,
             cors=cors,
         )
-        response = eh(request, exc)
+        response = await eh(request, exc)
 
         assert "access-control-allow-origin" not in response.headers
 
+    def test_cors_post_hook_parses_config_once(self, cors):
+        exc = SomethingWrongError("something bad")
+
+        with mock.patch.object(cors_middleware, "CORSMiddleware", wraps=cors_middleware.CORSMiddleware) as middleware:
+            eh = handler.ExceptionHandler(post_hooks=[handler.CorsPostHook(cors)])
+            eh(mock.Mock(headers={"origin": "localhost"}), exc)
+            eh(mock.Mock(headers={"origin": "localhost2"}), exc)
+
+        assert middleware.call_count == 1
+
+    def test_cors_post_hook_caches_decisions(self, cors):
+        exc = SomethingWrongError("something bad")
+        hook = handler.CorsPostHook(cors)
+
+        eh = handler.ExceptionHandler(post_hooks=[hook])
+        first = eh(mock.Mock(headers={"origin": "localhost"}), exc)
+        second = eh(mock.Mock(headers={"origin": "localhost"}), exc)
+        cookie = eh(mock.Mock(headers={"origin": "localhost", "cookie": "something"}), exc)
+
+        info = hook._headers_for.cache_info()
+        assert (info.hits, info.misses) == (1, 2)
+        assert first.headers["access-control-allow-origin"] == "*"
+        assert second.headers["access-control-allow-origin"] == "*"
+        assert cookie.headers["access-control-allow-origin"] == "localhost"
+
+    @pytest.mark.parametrize(
+        ("handlers", "exc"),
+        [
+            ({ValueError: lambda *_: error.BadRequestProblem("handled")}, ValueError("bad")),
+            ({}, error.BadRequestProblem("handled")),
+        ],
+    )
+    def test_default_problem_built_lazily(self, handlers, exc):
+        request = mock.Mock()
+
+        eh = handler.ExceptionHandler(handlers=handlers)
+        with mock.patch.object(handler, "Problem", wraps=handler.Problem) as problem:
+            response = eh(request, exc)
+
+        assert response.status_code == http.HTTPStatus.BAD_REQUEST
+        assert problem.call_count == 0
+
     def test_pre_hook(self):
         logger = mock.Mock()
 
@@ -472,6 +834,249 @@ class TestExceptionHandler:
         assert logger.debug.call_args == mock.call("<class 'ValueError'>")
 
 
+async def test_async_exception_handler_matches_sync(cors):
+    request = mock.Mock(headers={"origin": "https://example.com"})
+    exc = SomethingWrongError(detail="something bad")
+
+    kwargs = {"post_hooks": [handler.CorsPostHook(cors), handler.StripExtrasPostHook(enabled=True)]}
+    expected = handler.ExceptionHandler(**kwargs)(request, exc)
+    response = await handler.AsyncExceptionHandler(**kwargs)(request, exc)
+
+    assert (response.status_code, response.body, response.raw_headers) == (
+        expected.status_code,
+        expected.body,
+        expected.raw_headers,
+    )
+
+
+async def test_async_pre_hooks_run_concurrently():
+    first, second = anyio.Event(), anyio.Event()
+
+    async def hook_one(_request, _exc):
+        first.set()
+        await second.wait()
+
+    async def hook_two(_request, _exc):
+        second.set()
+        await first.wait()
+
+    eh = handler.AsyncExceptionHandler(pre_hooks=[hook_one, hook_two], hook_timeout=1)
+    with anyio.fail_after(1):
+        await eh(mock.Mock(), Exception("Something went bad"))
+
+    assert first.is_set()
+    assert second.is_set()
+
+
+async def test_async_pre_hook_timeout():
+    logger = mock.Mock()
+    m = mock.Mock()
+
+    async def slow(_request, _exc):
+        await anyio.sleep(10)
+        m.call("slow")
+
+    def fast(_request, _exc):
+        m.call("fast")
+
+    eh = handler.AsyncExceptionHandler(logger=logger, pre_hooks=[slow, fast], hook_timeout=0.01)
+    with anyio.fail_after(1):
+        response = await eh(mock.Mock(), SomethingWrongError())
+
+    assert response.status_code == http.HTTPStatus.INTERNAL_SERVER_ERROR
+    assert m.call.call_args_list == [mock.call("fast")]
+    assert logger.log.call_args == mock.call(logging.WARNING, "Hook %r timed out after %.3fs.", slow, 0.01)
+
+
+async def test_async_hook_failure_logged():
+    logger = mock.Mock()
+
+    async def hook(_request, _exc):
+        msg = "hook failure"
+        raise ValueError(msg)
+
+    eh = handler.AsyncExceptionHandler(logger=logger, pre_hooks=[hook])
+    response = await eh(mock.Mock(), error.NotFoundProblem())
+
+    assert response.status_code == http.HTTPStatus.NOT_FOUND
+    assert logger.exception.call_args == mock.call("Hook %r failed.", hook)
+
+
+async def test_async_post_hooks_run_in_order():
+    async def add_header(content, _request, response):
+        await anyio.lowlevel.checkpoint()
+        response.headers["x-first"] = "1"
+        return content, response
+
+    def check_header(content, _request, response):
+        response.headers["x-second"] = response.headers["x-first"]
+        return content, response
+
+    eh = handler.AsyncExceptionHandler(post_hooks=[add_header, check_header])
+    response = await eh(mock.Mock(), error.NotFoundProblem())
+
+    assert (response.headers["x-first"], response.headers["x-second"]) == ("1", "1")
+
+
+async def test_async_post_hooks_share_budget():
+    logger = mock.Mock()
+
+    async def slow(_content, _request, response):
+        await anyio.sleep(10)
+        return {}, response
+
+    async def fast(content, _request, response):
+        response.headers["x-fast"] = "1"
+        return content, response
+
+    eh = handler.AsyncExceptionHandler(logger=logger, post_hooks=[slow, fast], hook_budget=0.01)
+    with anyio.fail_after(1):
+        response = await eh(mock.Mock(), error.NotFoundProblem())
+
+    assert json.loads(response.body)["status"] == http.HTTPStatus.NOT_FOUND
+    assert "x-fast" not in response.headers
+    assert logger.log.call_count == len([slow, fast])
+
+
+async def test_async_process_content_single_pass():
+    class Hook:
+        async def process_content(self, content, _request, _status, headers):
+            headers["x-hook"] = "1"
+            return {**content, "hooked": True}
+
+    eh = handler.AsyncExceptionHandler(post_hooks=[Hook()], single_pass=True)
+    response = await eh(mock.Mock(), error.NotFoundProblem())
+
+    assert json.loads(response.body)["hooked"] is True
+    assert response.headers["x-hook"] == "1"
+    assert response.headers["content-length"] == str(len(response.body))
+
+
+async def test_async_handler():
+    async def handler_(_eh, _request, exc):
+        await anyio.lowlevel.checkpoint()
+        return error.BadRequestProblem(detail=str(exc))
+
+    eh = handler.AsyncExceptionHandler(handlers={ValueError: handler_}, handler_timeout=1)
+    response = await eh(mock.Mock(), ValueError("invalid"))
+
+    assert json.loads(response.body) == {
+        "type": "bad-request-problem",
+        "title": "Base http exception.",
+        "detail": "invalid",
+        "status": 400,
+    }
+
+
+async def test_async_handler_pass():
+    async def handler_(_eh, _request, _exc):
+        return None
+
+    def fallback(_eh, _request, _exc):
+        return error.BadRequestProblem()
+
+    eh = handler.AsyncExceptionHandler(handlers={ValueError: handler_, Exception: fallback})
+    response = await eh(mock.Mock(), ValueError("invalid"))
+
+    assert response.status_code == http.HTTPStatus.BAD_REQUEST
+
+
+async def test_async_handler_timeout_falls_back_to_default():
+    logger = mock.Mock()
+
+    async def slow(_eh, _request, _exc):
+        await anyio.sleep(10)
+
+    eh = handler.AsyncExceptionHandler(
+        logger=logger,
+        handlers={ValueError: slow},
+        unhandled_wrappers={"default": CustomUnhandledException},
+        handler_timeout=0.01,
+    )
+    with anyio.fail_after(1):
+        response = await eh(mock.Mock(), ValueError("invalid"))
+
+    assert json.loads(response.body) == {
+        "type": "custom-unhandled-exception",
+        "title": "Unhandled exception occurred.",
+        "detail": "invalid",
+        "status": 500,
+    }
+    assert logger.log.call_args == mock.call(logging.WARNING, "Handler %r timed out after %.3fs.", slow, 0.01)
+
+
+async def test_async_http_exception_handler_timeout_keeps_status():
+    async def slow(_eh, _request, _exc):
+        await anyio.sleep(10)
+
+    eh = handler.AsyncExceptionHandler(handlers={HTTPException: slow}, handler_timeout=0.01)
+    with anyio.fail_after(1):
+        response = await eh(mock.Mock(), HTTPException(status_code=http.HTTPStatus.NOT_FOUND))
+
+    assert json.loads(response.body) == {
+        "type": "http-not-found",
+        "title": "Not Found",
+        "detail": "Not Found",
+        "status": 404,
+    }
+
+
+def test_add_exception_handler_coroutine_hooks():
+    async def hook(_request, _exc):
+        pass
+
+    eh = handler.add_exception_handler(Starlette(), pre_hooks=[hook])
+    assert type(eh) is handler.AsyncExceptionHandler
+
+    with pytest.raises(ValueError, match=r"Coroutine handlers and hooks require the async exception handler\."):
+        handler.add_exception_handler(Starlette(), pre_hooks=[hook], async_handler=False)
+
+
+def test_non_blocking():
+    def hook(_request, _exc) -> None:
+        pass
+
+    assert handler.is_non_blocking(hook) is False
+    assert handler.non_blocking(hook) is hook
+    assert handler.is_non_blocking(hook) is True
+
+
+def custom_handler(_eh, _request, _exc):
+    return error.Problem("a problem")
+
+
+@pytest.mark.parametrize(
+    ("kwargs", "expected"),
+    [
+        ({}, handler.AsyncExceptionHandler),
+        ({"post_hooks": [handler.StripExtrasPostHook()]}, handler.AsyncExceptionHandler),
+        (
+            {"post_hooks": [handler.StripExtrasPostHook(logger=logging.getLogger(__name__))]},
+            handler.ExceptionHandler,
+        ),
+        (
+            {"post_hooks": [handler.StripExtrasPostHook(logger=log.QueueLogger(logging.getLogger(__name__)))]},
+            handler.AsyncExceptionHandler,
+        ),
+        ({"cors": CorsConfiguration(["*"], ["*"], ["*"], allow_credentials=False)}, handler.AsyncExceptionHandler),
+        ({"handlers": {ValueError: handler.non_blocking(lambda *_: None)}}, handler.AsyncExceptionHandler),
+        ({"handlers": {ValueError: custom_handler}}, handler.ExceptionHandler),
+        ({"pre_hooks": [lambda *_: None]}, handler.ExceptionHandler),
+        ({"post_hooks": [lambda c, _, r: (c, r)]}, handler.ExceptionHandler),
+        ({"http_exception_handler": custom_handler}, handler.ExceptionHandler),
+        ({"handlers": {ValueError: custom_handler}, "async_handler": True}, handler.AsyncExceptionHandler),
+        ({"async_handler": False}, handler.ExceptionHandler),
+        ({"logger": logging.getLogger(__name__)}, handler.ExceptionHandler),
+        ({"logger": log.QueueLogger(logging.getLogger(__name__))}, handler.AsyncExceptionHandler),
+        ({"logger": logging.getLogger(__name__), "async_handler": True}, handler.AsyncExceptionHandler),
+    ],
+)
+def test_add_exception_handler_selects_async_handler(kwargs, expected):
+    eh = handler.add_exception_handler(Starlette(), **kwargs)
+
+    assert type(eh) is expected
+
+
 async def test_exception_handler_in_app():
     m = mock.Mock()
 
@@ -525,6 +1130,148 @@ async def test_exception_handler_in_app_post_register():
     }
 
 
+async def test_async_http_exception_handler_in_app():
+    async def custom_handler(_eh, _request, exc) -> error.Problem:
+        await anyio.lowlevel.checkpoint()
+        return error.Problem("a problem", status=exc.status_code)
+
+    app = Starlette()
+
+    eh = handler.add_exception_handler(
+        app=app,
+        http_exception_handler=custom_handler,
+        handler_timeout=1,
+    )
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False, client=("1.2.3.4", 123))
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    r = await client.get("/endpoint")
+    assert type(eh) is handler.AsyncExceptionHandler
+    assert r.json() == {
+        "type": "problem",
+        "title": "a problem",
+        "status": 404,
+    }
+
+
+LARGE_ERRORS = [{"loc": ["body", i], "msg": "Field required."} for i in range(2000)]
+
+
+def test_max_list_length():
+    eh = handler.ExceptionHandler(max_list_length=2)
+
+    response = eh(mock.Mock(), error.UnprocessableProblem("Invalid.", errors=LARGE_ERRORS))
+
+    assert json.loads(response.body)["errors"] == LARGE_ERRORS[:2]
+    assert json.loads(response.body)["truncated"] == {"errors": 2000}
+    assert response.headers["content-length"] == str(len(response.body))
+
+
+def test_max_body_bytes():
+    eh = handler.ExceptionHandler(max_body_bytes=1024)
+
+    response = eh(mock.Mock(), error.UnprocessableProblem("Invalid.", errors=LARGE_ERRORS))
+
+    assert len(response.body) <= 1024  # noqa: PLR2004
+    assert json.loads(response.body)["truncated"] == {"errors": 2000}
+
+
+async def test_stream_threshold():
+    async def validate(_request):
+        msg = "Invalid."
+        raise error.UnprocessableProblem(msg, errors=LARGE_ERRORS)
+
+    app = Starlette(routes=[Route("/validate", validate)])
+    handler.add_exception_handler(app, stream_threshold=1024, cors=CorsConfiguration(["*"], ["*"], ["*"], False))  # noqa: FBT003
+
+    transport = httpx.ASGITransport(app=app)
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+    r = await client.get("/validate", headers={"origin": "https://example.com"})
+
+    assert r.status_code == http.HTTPStatus.UNPROCESSABLE_ENTITY
+    assert r.headers["content-type"] == "application/problem+json"
+    assert r.headers["access-control-allow-origin"] == "*"
+    assert "content-length" not in r.headers
+    assert r.json()["errors"] == LARGE_ERRORS
+
+
+def test_stream_threshold_small_problem():
+    eh = handler.ExceptionHandler(stream_threshold=1024)
+
+    response = eh(mock.Mock(), error.NotFoundProblem("Not found."))
+
+    assert response.body == encoder.json_encoder(json.loads(response.body))
+    assert response.headers["content-length"] == str(len(response.body))
+
+
+def test_stream_threshold_strip_extras():
+    eh = handler.ExceptionHandler(stream_threshold=1024, post_hooks=[handler.StripExtrasPostHook(enabled=True)])
+
+    response = eh(mock.Mock(headers={}), error.UnprocessableProblem("Invalid.", errors=LARGE_ERRORS))
+
+    assert json.loads(response.body) == {
+        "type": "unprocessable-problem",
+        "title": "Base http exception.",
+        "status": 422,
+        "detail": "Invalid.",
+    }
+    assert response.headers["content-length"] == str(len(response.body))
+
+
+class ClientError(error.StatusProblem):
+    status = 400
+    title = "Client error."
+
+
+@pytest.mark.parametrize(
+    ("status_code", "expected"),
+    [
+        (404, "custom-not-found"),
+        (418, "client"),
+        (499, "client"),
+        (503, "http-service-unavailable"),
+    ],
+)
+def test_http_exception_status_family_wrappers(status_code, expected):
+    class CustomNotFound(error.StatusProblem):
+        status = 404
+        title = "Not found."
+
+    eh = handler.ExceptionHandler(unhandled_wrappers={"4xx": ClientError, "404": CustomNotFound})
+
+    problem = handler.http_exception_handler_(eh, mock.Mock(), HTTPException(status_code=status_code))
+
+    assert problem.type == expected
+
+
+def test_http_exception_non_standard_status():
+    eh = handler.ExceptionHandler()
+
+    problem = handler.http_exception_handler_(eh, mock.Mock(), HTTPException(status_code=499))
+
+    assert (problem.status, problem.title, problem.type) == (499, "Client Error", "http-client-error")
+
+
+def test_unhandled_wrappers_family_default():
+    eh = handler.ExceptionHandler(unhandled_wrappers={"5xx": CustomUnhandledException})
+
+    response = eh(mock.Mock(), Exception("Something went bad"))
+
+    assert json.loads(response.body)["type"] == "custom-unhandled-exception"
+
+
+def test_unhandled_wrappers_updated_on_change():
+    eh = handler.ExceptionHandler()
+    eh.unhandled_wrappers["4xx"] = ClientError
+
+    assert eh.wrapper_for(404) is ClientError
+
+    del eh.unhandled_wrappers["4xx"]
+
+    assert eh.wrapper_for(404) is None
+
+
 async def test_custom_http_exception_handler_in_app():
     def custom_handler(_eh, _request, _exc) -> error.Problem:
         return error.Problem("a problem")
@@ -545,3 +1292,550 @@ async def test_custom_http_exception_handler_in_app():
         "title": "a problem",
         "status": 500,
     }
+
+
+def accept(value):
+    return mock.Mock(headers={"accept": value})
+
+
+@pytest.mark.parametrize(
+    ("value", "content_type"),
+    [
+        ("application/problem+msgpack", "application/problem+msgpack"),
+        ("application/problem+cbor", "application/problem+cbor"),
+        ("application/problem+json", "application/problem+json"),
+        ("*/*", "application/problem+json"),
+        ("text/html", "application/problem+json"),
+    ],
+)
+def test_formats(value, content_type):
+    msgpack = pytest.importorskip("msgpack")
+    cbor2 = pytest.importorskip("cbor2")
+    eh = handler.ExceptionHandler(formats=["msgpack", "cbor"])
+    problem = error.UnprocessableProblem("Invalid.", errors=LARGE_ERRORS[:2])
+
+    response = eh(accept(value), problem)
+
+    decode = {
+        "application/problem+msgpack": msgpack.unpackb,
+        "application/problem+cbor": cbor2.loads,
+        "application/problem+json": json.loads,
+    }[content_type]
+    assert response.headers["content-type"] == content_type
+    assert response.headers["vary"] == "Accept"
+    assert response.headers["content-length"] == str(len(response.body))
+    assert decode(response.body) == problem.marshal()
+
+
+def test_formats_not_configured():
+    eh = handler.ExceptionHandler()
+
+    response = eh(accept("application/problem+msgpack"), error.NotFoundProblem("Not found."))
+
+    assert response.headers["content-type"] == "application/problem+json"
+    assert "vary" not in response.headers
+
+
+def test_formats_accept_cached():
+    pytest.importorskip("msgpack")
+    eh = handler.ExceptionHandler(formats=["msgpack"])
+
+    for _ in range(3):
+        eh(accept("application/problem+msgpack"), error.NotFoundProblem("Not found."))
+
+    assert (eh._accept.cache_info().hits, eh._accept.cache_info().misses) == (2, 1)
+
+
+def test_formats_response_cache():
+    msgpack = pytest.importorskip("msgpack")
+    eh = handler.ExceptionHandler(formats=["msgpack"], response_cache=cache.ResponseCache())
+    problem = error.NotFoundProblem("Not found.")
+
+    json_response = eh(accept("application/problem+json"), problem)
+    msgpack_response = eh(accept("application/problem+msgpack"), problem)
+
+    assert json.loads(json_response.body) == msgpack.unpackb(msgpack_response.body) == problem.marshal()
+
+
+@pytest.mark.parametrize("single_pass", [True, False])
+def test_formats_strip_extras(single_pass):
+    msgpack = pytest.importorskip("msgpack")
+    eh = handler.ExceptionHandler(
+        formats=["msgpack"],
+        post_hooks=[handler.StripExtrasPostHook(enabled=True)],
+        single_pass=single_pass,
+    )
+
+    response = eh(accept("application/problem+msgpack"), error.ServerProblem("Server error.", trace_id="abc"))
+
+    assert msgpack.unpackb(response.body) == {
+        "type": "server-problem",
+        "title": "Base http exception.",
+        "status": 500,
+        "detail": "Server error.",
+    }
+    assert response.headers["content-length"] == str(len(response.body))
+
+
+def test_formats_max_body_bytes():
+    msgpack = pytest.importorskip("msgpack")
+    eh = handler.ExceptionHandler(formats=["msgpack"], max_body_bytes=1024, stream_threshold=512)
+
+    response = eh(accept("application/problem+msgpack"), error.UnprocessableProblem("Invalid.", errors=LARGE_ERRORS))
+
+    assert len(response.body) <= 1024  # noqa: PLR2004
+    assert msgpack.unpackb(response.body)["truncated"] == {"errors": 2000}
+
+
+def test_formats_not_streamed():
+    msgpack = pytest.importorskip("msgpack")
+    eh = handler.ExceptionHandler(formats=["msgpack"], stream_threshold=1024)
+
+    response = eh(accept("application/problem+msgpack"), error.UnprocessableProblem("Invalid.", errors=LARGE_ERRORS))
+
+    assert msgpack.unpackb(response.body)["errors"] == LARGE_ERRORS
+
+
+async def test_formats_in_app(cors):
+    msgpack = pytest.importorskip("msgpack")
+    app = Starlette()
+    handler.add_exception_handler(app, cors=cors, formats=["msgpack"])
+
+    transport = httpx.ASGITransport(app=app)
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+    r = await client.get("/missing", headers={"accept": "application/problem+msgpack", "origin": "https://example.com"})
+
+    assert r.status_code == http.HTTPStatus.NOT_FOUND
+    assert r.headers["content-type"] == "application/problem+msgpack"
+    assert r.headers["vary"] == "Accept"
+    assert r.headers["access-control-allow-origin"] == "*"
+    assert msgpack.unpackb(r.content)["type"] == "http-not-found"
+
+
+def accept_encoding(value):
+    return mock.Mock(headers={"accept-encoding": value})
+
+
+def test_compress_threshold():
+    eh = handler.ExceptionHandler(compress_threshold=1024)
+    problem = error.UnprocessableProblem("Invalid.", errors=LARGE_ERRORS)
+
+    response = eh(accept_encoding("gzip, br"), problem)
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["content-length"] == str(len(response.body))
+    assert json.loads(gzip.decompress(response.body)) == problem.marshal()
+
+
+def test_compress_threshold_small_problem():
+    eh = handler.ExceptionHandler(compress_threshold=1024)
+
+    response = eh(accept_encoding("gzip"), error.NotFoundProblem("Not found."))
+
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+
+
+def test_compress_threshold_not_accepted():
+    eh = handler.ExceptionHandler(compress_threshold=1024)
+    problem = error.UnprocessableProblem("Invalid.", errors=LARGE_ERRORS)
+
+    response = eh(accept_encoding("gzip;q=0"), problem)
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert json.loads(response.body) == problem.marshal()
+
+
+def test_compress_threshold_after_post_hooks():
+    eh = handler.ExceptionHandler(compress_threshold=64, post_hooks=[handler.StripExtrasPostHook(enabled=True)])
+
+    response = eh(accept_encoding("gzip"), error.UnprocessableProblem("Invalid.", errors=LARGE_ERRORS))
+
+    assert json.loads(gzip.decompress(response.body)) == {
+        "type": "unprocessable-problem",
+        "title": "Base http exception.",
+        "status": 422,
+        "detail": "Invalid.",
+    }
+    assert response.headers["content-length"] == str(len(response.body))
+
+
+def test_compress_threshold_response_cache():
+    eh = handler.ExceptionHandler(compress_threshold=16, response_cache=cache.ResponseCache())
+    problem = error.NotFoundProblem("Not found.")
+
+    with mock.patch.object(compression, "gzip_compress", wraps=compression.gzip_compress) as compress:
+        responses = [eh(accept_encoding("gzip"), problem) for _ in range(3)]
+
+    assert compress.call_count == 1
+    assert len({response.body for response in responses}) == 1
+    assert json.loads(gzip.decompress(responses[0].body)) == problem.marshal()
+
+
+async def test_compress_threshold_in_app():
+    async def validate(_request):
+        msg = "Invalid."
+        raise error.UnprocessableProblem(msg, errors=LARGE_ERRORS)
+
+    app = Starlette(routes=[Route("/validate", validate)])
+    handler.add_exception_handler(app, compress_threshold=1024)
+
+    transport = httpx.ASGITransport(app=app)
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+    r = await client.get("/validate", headers={"accept-encoding": "gzip"})
+
+    assert r.headers["content-encoding"] == "gzip"
+    assert int(r.headers["content-length"]) < len(json.dumps(LARGE_ERRORS))
+    assert r.json()["errors"] == LARGE_ERRORS
+
+
+async def test_compress_threshold_streamed():
+    async def validate(_request):
+        msg = "Invalid."
+        raise error.UnprocessableProblem(msg, errors=LARGE_ERRORS)
+
+    app = Starlette(routes=[Route("/validate", validate)])
+    handler.add_exception_handler(app, compress_threshold=1024, stream_threshold=1024)
+
+    transport = httpx.ASGITransport(app=app)
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+    r = await client.get("/validate", headers={"accept-encoding": "gzip"})
+
+    assert (r.headers["content-encoding"], r.headers["vary"]) == ("gzip", "Accept-Encoding")
+    assert "content-length" not in r.headers
+    assert r.json()["errors"] == LARGE_ERRORS
+
+
+def reference_response(request, problem, post_hooks):
+    """Build a response the way the handler did before raw header rendering."""
+    headers = {"content-type": "application/problem+json"}
+    headers.update(problem.headers or {})
+    content = problem.marshal()
+    response = JSONResponse(status_code=problem.status, content=content, headers=headers)
+
+    for post_hook in post_hooks:
+        content, response = post_hook(content, request, response)
+        response.headers["content-length"] = str(len(response.body))
+
+    return response
+
+
+def add_header_post_hook(content, _request, response):
+    response.headers["x-post-hook"] = "value"
+    return content, response
+
+
+@pytest.mark.parametrize(
+    "problem",
+    [
+        error.NotFoundProblem("Not found."),
+        error.ServerProblem("Server error.", trace_id="abc", headers={"x-header": "value", "Retry-After": "10"}),
+        error.BadRequestProblem("Bad request.", headers={"content-type": "application/json"}),
+        error.BadRequestProblem("Bad request.", headers={"Content-Type": "application/json"}),
+    ],
+)
+@pytest.mark.parametrize(
+    "post_hooks",
+    [
+        [],
+        [add_header_post_hook],
+        [handler.StripExtrasPostHook(enabled=True)],
+        [handler.CorsPostHook(CorsConfiguration(["https://example.com"], ["*"], ["*"], False)), add_header_post_hook],  # noqa: FBT003
+    ],
+)
+@pytest.mark.parametrize("response_cache", [None, cache.ResponseCache()])
+def test_raw_header_response_matches_reference(problem, post_hooks, response_cache):
+    request = mock.Mock(headers={"origin": "https://example.com"})
+    eh = handler.ExceptionHandler(post_hooks=post_hooks, response_cache=response_cache, encoder="json")
+    expected = reference_response(request, problem, post_hooks)
+
+    for _ in range(2):
+        response = eh(request, problem)
+
+        assert (response.status_code, response.body, response.raw_headers) == (
+            expected.status_code,
+            expected.body,
+            expected.raw_headers,
+        )
+
+
+def recording_post_hook(calls, name):
+    def post_hook(content, _request, response):
+        calls.append(name)
+        return content, response
+
+    return post_hook
+
+
+@pytest.mark.parametrize(
+    ("problem", "expected"),
+    [
+        (error.ServerProblem("Server error."), ["all", "5xx", "server-or-404", "last"]),
+        (error.NotFoundProblem("Not found."), ["all", "server-or-404", "last"]),
+        (error.BadRequestProblem("Bad request."), ["all", "type", "last"]),
+        (error.UnprocessableProblem("Invalid."), ["all", "last"]),
+    ],
+)
+def test_filtered_post_hooks(problem, expected):
+    calls = []
+    eh = handler.ExceptionHandler(
+        post_hooks=[
+            recording_post_hook(calls, "all"),
+            handler.FilteredHook(recording_post_hook(calls, "5xx"), include=["5xx"]),
+            handler.FilteredHook(recording_post_hook(calls, "server-or-404"), include=[404, "type:server-problem"]),
+            handler.FilteredHook(recording_post_hook(calls, "type"), include=["type:bad-request-problem"]),
+            recording_post_hook(calls, "last"),
+        ],
+    )
+
+    eh(mock.Mock(), problem)
+
+    assert calls == expected
+
+
+async def test_filtered_post_hooks_documentation_uri_template():
+    calls = []
+    kwargs = {
+        "post_hooks": [handler.FilteredHook(recording_post_hook(calls, "type"), include=["type:bad-request-problem"])],
+        "documentation_uri_template": "https://docs/{type}",
+    }
+    exc = error.BadRequestProblem("Bad request.")
+
+    responses = [
+        handler.ExceptionHandler(**kwargs)(mock.Mock(), exc),
+        await handler.AsyncExceptionHandler(**kwargs)(mock.Mock(), exc),
+    ]
+
+    assert [json.loads(r.body)["type"] for r in responses] == ["https://docs/bad-request-problem"] * 2
+    assert calls == ["type", "type"]
+
+
+def test_filtered_hooks_by_exception():
+    calls = []
+    eh = handler.ExceptionHandler(
+        pre_hooks=[
+            handler.FilteredHook(lambda _request, _exc: calls.append("pre-runtime"), exceptions=[RuntimeError]),
+            lambda _request, _exc: calls.append("pre"),
+        ],
+        post_hooks=[
+            handler.FilteredHook(recording_post_hook(calls, "post-runtime"), exceptions=[RuntimeError]),
+            handler.FilteredHook(recording_post_hook(calls, "post-key"), include=["5xx"], exceptions=[KeyError]),
+        ],
+    )
+
+    eh(mock.Mock(), NotImplementedError())
+    eh(mock.Mock(), KeyError())
+
+    assert calls == ["pre-runtime", "pre", "post-runtime", "pre", "post-key"]
+
+
+def test_filtered_pre_hooks_reject_problem_filters():
+    with pytest.raises(ValueError, match="can only be filtered by exception"):
+        handler.ExceptionHandler(pre_hooks=[handler.FilteredHook(mock.Mock(), include=["5xx"])])
+
+
+def test_filtered_hooks_single_pass():
+    calls = []
+    eh = handler.ExceptionHandler(
+        post_hooks=[
+            handler.FilteredHook(handler.StripExtrasPostHook(enabled=True), include=["5xx"]),
+            recording_post_hook(calls, "response"),
+        ],
+        single_pass=True,
+    )
+
+    server = eh(mock.Mock(), error.ServerProblem("Server error.", trace_id="abc"))
+    client = eh(mock.Mock(), error.BadRequestProblem("Bad request.", trace_id="abc"))
+
+    assert "trace_id" not in json.loads(server.body)
+    assert json.loads(client.body)["trace_id"] == "abc"
+    assert calls == ["response", "response"]
+
+
+def test_hook_chains_cached():
+    eh = handler.ExceptionHandler(post_hooks=[handler.FilteredHook(mock.Mock(), include=["4xx"])])
+
+    for _ in range(3):
+        eh(mock.Mock(), error.ServerProblem("Server error."))
+
+    assert (eh._post_chain.cache_info().hits, eh._post_chain.cache_info().misses) == (2, 1)
+    assert (eh._pre_chain.cache_info().hits, eh._pre_chain.cache_info().misses) == (2, 1)
+
+
+def test_hook_chains_updated_on_change():
+    calls = []
+    eh = handler.ExceptionHandler()
+    eh(mock.Mock(), error.ServerProblem("Server error."))
+
+    eh.pre_hooks.append(lambda _request, _exc: calls.append("pre"))
+    eh.post_hooks.append(recording_post_hook(calls, "post"))
+    eh(mock.Mock(), error.ServerProblem("Server error."))
+
+    assert calls == ["pre", "post"]
+
+    eh.post_hooks.clear()
+    eh(mock.Mock(), error.ServerProblem("Server error."))
+
+    assert calls == ["pre", "post", "pre"]
+
+
+async def test_async_filtered_hooks():
+    calls = []
+
+    async def post_hook(content, _request, response):
+        await anyio.lowlevel.checkpoint()
+        calls.append("post")
+        return content, response
+
+    eh = handler.AsyncExceptionHandler(post_hooks=[handler.FilteredHook(post_hook, include=["5xx"])])
+
+    await eh(mock.Mock(), error.NotFoundProblem("Not found."))
+    await eh(mock.Mock(), error.ServerProblem("Server error."))
+
+    assert calls == ["post"]
+
+
+def test_filtered_hooks_non_blocking():
+    async def post_hook(content, _request, response):
+        return content, response
+
+    filtered = handler.FilteredHook(post_hook, include=["5xx"])
+
+    assert handler.is_non_blocking(filtered)
+    assert not handler.is_non_blocking(handler.FilteredHook(lambda *_: None))
+    with pytest.raises(ValueError, match="Coroutine handlers and hooks require the async exception handler"):
+        handler.add_exception_handler(Starlette(), post_hooks=[filtered], async_handler=False)
+
+
+@pytest.mark.parametrize(
+    "mutate",
+    [
+        lambda hooks, h: hooks.append(h),
+        lambda hooks, h: hooks.extend([h]),
+        lambda hooks, h: hooks.insert(0, h),
+        lambda hooks, h: hooks.__iadd__([h]),
+        lambda hooks, h: hooks.__setitem__(slice(0, 0), [h]),
+    ],
+)
+def test_hook_chains_invalidated_on_add(mutate):
+    calls = []
+    eh = handler.ExceptionHandler(pre_hooks=[], post_hooks=[])
+    eh(mock.Mock(), error.ServerProblem("Server error."))
+
+    mutate(eh.pre_hooks, lambda _request, _exc: calls.append("pre"))
+    mutate(eh.post_hooks, recording_post_hook(calls, "post"))
+    eh(mock.Mock(), error.ServerProblem("Server error."))
+
+    assert calls == ["pre", "post"]
+
+
+@pytest.mark.parametrize(
+    "mutate",
+    [
+        lambda hooks: hooks.pop(),
+        lambda hooks: hooks.remove(hooks[0]),
+        lambda hooks: hooks.__delitem__(0),
+        lambda hooks: hooks.clear(),
+    ],
+)
+def test_hook_chains_invalidated_on_remove(mutate):
+    calls = []
+    eh = handler.ExceptionHandler(
+        pre_hooks=[lambda _request, _exc: calls.append("pre")],
+        post_hooks=[recording_post_hook(calls, "post")],
+    )
+    eh(mock.Mock(), error.ServerProblem("Server error."))
+
+    mutate(eh.pre_hooks)
+    mutate(eh.post_hooks)
+    eh(mock.Mock(), error.ServerProblem("Server error."))
+
+    assert calls == ["pre", "post"]
+
+
+@pytest.mark.parametrize(
+    ("mutate", "expected"),
+    [
+        (lambda hooks: hooks.__setitem__(0, hooks[1]), ["a", "a"]),
+        (lambda hooks: hooks.reverse(), ["a", "b"]),
+        (lambda hooks: hooks.sort(key=lambda hook: hook.__name__), ["a", "b"]),
+    ],
+)
+def test_hook_chains_invalidated_on_reorder(mutate, expected):
+    calls = []
+
+    def b(_request, _exc):
+        calls.append("b")
+
+    def a(_request, _exc):
+        calls.append("a")
+
+    eh = handler.ExceptionHandler(pre_hooks=[b, a])
+    eh(mock.Mock(), error.ServerProblem("Server error."))
+    calls.clear()
+
+    mutate(eh.pre_hooks)
+    eh(mock.Mock(), error.ServerProblem("Server error."))
+
+    assert calls == expected
+
+
+@pytest.mark.parametrize(
+    "mutate",
+    [
+        lambda hooks, h: hooks.append(h),
+        lambda hooks, h: hooks.extend([h]),
+        lambda hooks, h: hooks.insert(0, h),
+        lambda hooks, h: hooks.__iadd__([h]),
+        lambda hooks, h: hooks.__setitem__(0, h),
+        lambda hooks, h: hooks.__setitem__(slice(0, 1), [h]),
+    ],
+)
+def test_filtered_pre_hooks_rejected_before_mutation(mutate):
+    calls = []
+    pre_hook = handler.FilteredHook(lambda _request, _exc: calls.append("filtered"), include=[500])
+    eh = handler.ExceptionHandler(pre_hooks=[lambda _request, _exc: calls.append("pre")])
+
+    with pytest.raises(ValueError, match="can only be filtered by exception"):
+        mutate(eh.pre_hooks, pre_hook)
+
+    eh(mock.Mock(), error.ServerProblem("Server error."))
+
+    assert (len(eh.pre_hooks), calls) == (1, ["pre"])
+
+
+def test_filtered_hook_attributes():
+    hook = handler.FilteredHook(handler.StripExtrasPostHook(enabled=True), include=["5xx"])
+
+    assert hook.enabled is True
+    assert repr(hook).startswith("FilteredHook(<starlette_problem.handler.StripExtrasPostHook")
+    with pytest.raises(AttributeError):
+        hook.__getattr__("hook")
+
+
+def test_exporter_and_metrics():
+    exporter, metrics = mock.Mock(), mock.Mock()
+    eh = handler.ExceptionHandler(exporter=exporter, metrics=metrics)
+    request, exc = mock.Mock(), RuntimeError("Something went bad")
+
+    eh(request, exc)
+
+    problem = exporter.record.call_args[0][2]
+    assert exporter.record.call_args[0][:2] == (request, exc)
+    assert problem.type == "unhandled-exception"
+    assert metrics.record.call_args[0][:3] == (500, "unhandled-exception", RuntimeError)
+
+
+def test_strip_extras_logged():
+    logger = mock.Mock()
+    eh = handler.ExceptionHandler(post_hooks=[handler.StripExtrasPostHook(logger=logger, enabled=True)])
+
+    response = eh(mock.Mock(), error.ServerProblem("Server error.", trace_id="abc"))
+
+    assert "trace_id" not in json.loads(response.body)
+    assert logger.debug.call_args_list == [
+        mock.call("Stripping debug information from exception."),
+        mock.call("Removed trace_id: abc"),
+    ]
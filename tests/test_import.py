@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Cold start budget for `import starlette_problem.handler`, on top of the
+# starlette and rfc9457 modules any application imports anyway. Measured at 7
+# modules and ~5ms with compiled bytecode, the time budget leaves room for
+# shared CI machines and only catches gross regressions, the module budget is
+# the tight one.
+MODULE_BUDGET = 8
+IMPORT_TIME_BUDGET_US = 50_000
+
+DEPENDENCIES = "starlette.requests, starlette.responses, starlette.exceptions, rfc9457"
+
+SCRIPT = f"""
+import json, sys
+import {DEPENDENCIES}
+before = set(sys.modules)
+import starlette_problem.handler
+print(json.dumps(sorted(set(sys.modules) - before)))
+"""
+
+
+def import_profile():
+    """Import the handler in a fresh interpreter, returning new modules and per module import times.
+
+    Bytecode is compiled by a first import, so times reflect an installed
+    package rather than compiling the sources.
+    """
+    with tempfile.TemporaryDirectory() as pycache:
+        env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+        env["PYTHONPYCACHEPREFIX"] = pycache
+        for _ in range(2):
+            result = subprocess.run(  # noqa: S603
+                [sys.executable, "-X", "importtime", "-c", SCRIPT],
+                capture_output=True,
+                text=True,
+                check=True,
+                env=env,
+            )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, _cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(self_us)
+
+    return json.loads(result.stdout), times
+
+
+def test_import_module_budget():
+    modules, _ = import_profile()
+
+    assert len(modules) <= MODULE_BUDGET, modules
+
+
+def test_import_time_budget():
+    modules, times = import_profile()
+
+    assert sum(times[module] for module in modules) <= IMPORT_TIME_BUDGET_US
+
+
+def test_optional_features_imported_lazily():
+    modules, _ = import_profile()
+
+    assert "starlette.middleware" not in modules
+    assert "starlette.middleware.cors" not in modules
+    assert "starlette_problem.schemas" not in modules
+    assert "starlette_problem.metrics" not in modules
+    assert "starlette_problem.log" not in modules
+    assert "msgpack" not in modules
+    assert "cbor2" not in modules
+    assert "orjson" not in modules
+    assert "hashlib" not in modules
+    assert "starlette_problem.compression" not in modules
+    assert "starlette_problem.limits" not in modules
+    assert "starlette_problem.middleware" not in modules
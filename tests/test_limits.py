@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from starlette_problem import encoder, limits
+
+ERRORS = [{"loc": ["body", i], "msg": "Field required.", "type": "missing"} for i in range(1000)]
+CONTENT = {
+    "type": "unprocessable",
+    "title": "Request validation failed.",
+    "status": 422,
+    "detail": "Invalid items.",
+    "errors": ERRORS,
+    "warnings": ERRORS[:10],
+}
+
+
+def test_truncate_lists():
+    content = limits.truncate_lists(CONTENT, 5)
+
+    assert content["errors"] == ERRORS[:5]
+    assert content["warnings"] == ERRORS[:5]
+    assert content["truncated"] == {"errors": 1000, "warnings": 10}
+    assert len(CONTENT["errors"]) == len(ERRORS)
+
+
+def test_truncate_lists_within_limit():
+    assert limits.truncate_lists(CONTENT, 1000) is CONTENT
+
+
+def test_encode_within_fits():
+    content, body = limits.encode_within(CONTENT, 1024 * 1024)
+
+    assert content is CONTENT
+    assert body == encoder.json_encoder(CONTENT)
+
+
+def test_encode_within_truncates_lists():
+    content, body = limits.encode_within(CONTENT, 2048)
+
+    assert len(body) <= 2048  # noqa: PLR2004
+    assert json.loads(body) == content
+    assert content["errors"] == ERRORS[: len(content["errors"])]
+    assert content["truncated"] == {"errors": 1000, "warnings": 10}
+
+
+def test_encode_within_is_deterministic():
+    assert limits.encode_within(CONTENT, 2048) == limits.encode_within(CONTENT, 2048)
+
+
+def test_encode_within_keeps_list_truncation_marker():
+    content, _ = limits.encode_within(limits.truncate_lists(CONTENT, 500), 2048)
+
+    assert content["truncated"] == {"errors": 1000, "warnings": 10}
+
+
+def test_encode_within_falls_back_to_core_fields():
+    content, body = limits.encode_within({**CONTENT, "context": "x" * 4096}, 1024)
+
+    assert (
+        json.loads(body)
+        == content
+        == {
+            "type": "unprocessable",
+            "title": "Request validation failed.",
+            "status": 422,
+            "detail": "Invalid items.",
+            "truncated": {"errors": None, "warnings": None, "context": None},
+        }
+    )
+
+
+@pytest.mark.parametrize("threshold", [0, 100, 10 * 1024])
+def test_buffer_encode_streams_above_threshold(threshold):
+    body, chunks = limits.buffer_encode(CONTENT, threshold)
+
+    assert body is None
+    assert b"".join(chunks) == encoder.json_encoder(CONTENT)
+
+
+def test_buffer_encode_below_threshold():
+    body, chunks = limits.buffer_encode(CONTENT, 1024 * 1024)
+
+    assert chunks is None
+    assert body == encoder.json_encoder(CONTENT)
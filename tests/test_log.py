@@ -0,0 +1,315 @@
+import logging
+import threading
+from unittest import mock
+
+import anyio
+import pytest
+from starlette.applications import Starlette
+
+from starlette_problem import error, handler, log
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self, release=None):
+        super().__init__()
+        self.records = []
+        self.threads = []
+        self.release = release
+
+    def emit(self, record):
+        if self.release:
+            self.release.wait(timeout=5)
+        self.records.append(self.format(record))
+        self.threads.append(threading.current_thread().name)
+
+
+@pytest.fixture
+def handler_():
+    return RecordingHandler()
+
+
+@pytest.fixture
+def logger(handler_):
+    logger = logging.getLogger("starlette_problem.tests.log")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler_)
+    yield logger
+    logger.removeHandler(handler_)
+
+
+def raise_error():
+    try:
+        msg = "Something went bad"
+        raise ValueError(msg)  # noqa: TRY301
+    except ValueError as e:
+        return e
+
+
+def test_exception_emitted_in_background(logger, handler_):
+    ql = log.QueueLogger(logger)
+    exc = raise_error()
+
+    ql.exception("Unhandled exception occurred.", exc_info=(type(exc), exc, exc.__traceback__))
+    ql.close()
+
+    assert handler_.threads == ["starlette-problem-logger"]
+    assert handler_.records[0].startswith("Unhandled exception occurred.\nTraceback")
+    assert "ValueError: Something went bad" in handler_.records[0]
+
+
+def test_log_respects_level(logger, handler_):
+    logger.setLevel(logging.ERROR)
+    ql = log.QueueLogger(logger)
+
+    ql.log(logging.INFO, "ignored")
+    ql.close()
+
+    assert handler_.records == []
+    assert ql.queue.empty()
+
+
+def test_overflow_drop(logger):
+    release = threading.Event()
+    logger.handlers[0].release = release
+    ql = log.QueueLogger(logger, maxsize=1)
+    count = 5
+
+    for _ in range(count):
+        ql.log(logging.ERROR, "record")
+
+    release.set()
+    ql.close()
+
+    # At most one record being emitted, and one queued.
+    assert ql.dropped >= count - 2
+    assert len(logger.handlers[0].records) + ql.dropped == count
+
+
+def test_overflow_block_with_timeout(logger):
+    release = threading.Event()
+    logger.handlers[0].release = release
+    ql = log.QueueLogger(logger, maxsize=1, overflow="block", timeout=0.01)
+    count = 5
+
+    for _ in range(count):
+        ql.log(logging.ERROR, "record")
+
+    release.set()
+    ql.close()
+
+    assert ql.dropped > 0
+    assert len(logger.handlers[0].records) + ql.dropped == count
+
+
+def test_overflow_block(logger, handler_):
+    ql = log.QueueLogger(logger, maxsize=1, overflow="block")
+
+    for i in range(5):
+        ql.log(logging.ERROR, "record %s", i)
+
+    ql.close()
+
+    assert ql.dropped == 0
+    assert handler_.records == [f"record {i}" for i in range(5)]
+
+
+def test_unknown_overflow(logger):
+    with pytest.raises(ValueError, match="Unknown overflow policy 'ignore'"):
+        log.QueueLogger(logger, overflow="ignore")
+
+
+def log_from(target, exc):
+    target.exception("Unhandled exception occurred.", exc_info=(type(exc), exc, exc.__traceback__))
+    target.log(logging.WARNING, "Summary.")
+
+
+def test_caller_recorded(logger, handler_):
+    handler_.setFormatter(logging.Formatter("%(pathname)s:%(lineno)d:%(funcName)s"))
+    ql = log.QueueLogger(logger)
+
+    log_from(ql, raise_error())
+    ql.close()
+
+    lineno = log_from.__code__.co_firstlineno
+    assert [record.split("\n")[0] for record in handler_.records] == [
+        f"{__file__}:{lineno + 1}:log_from",
+        f"{__file__}:{lineno + 2}:log_from",
+    ]
+
+
+def test_close_without_start(logger):
+    log.QueueLogger(logger).close()
+
+
+def test_failing_handler_does_not_stop_thread(logger, handler_):
+    class FailingFilter(logging.Filter):
+        def filter(self, record):
+            if record.msg == "fail":
+                raise RuntimeError
+            return True
+
+    logger.addFilter(failing := FailingFilter())
+    ql = log.QueueLogger(logger)
+
+    ql.log(logging.ERROR, "fail")
+    ql.log(logging.ERROR, "ok")
+    ql.close()
+    logger.removeFilter(failing)
+
+    assert handler_.records == ["ok"]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def occurrence(msg="Something went bad", type_="unhandled-exception"):
+    return raise_error(), error.Problem("Unhandled exception occurred.", type_=type_, detail=msg)
+
+
+def raise_other_error():
+    try:
+        msg = "Something else"
+        raise ValueError(msg)  # noqa: TRY301
+    except ValueError as e:
+        return e
+
+
+def test_sampler_limits_occurrences_per_window():
+    clock = Clock()
+    logger = mock.Mock()
+    sampler = log.LogSampler(window=60, limit=2, clock=clock)
+
+    assert [sampler.sample(logger, *occurrence()) for _ in range(4)] == [True, True, False, False]
+    assert logger.log.call_count == 0
+
+
+def test_sampler_summarises_when_window_closes():
+    clock = Clock()
+    logger = mock.Mock()
+    sampler = log.LogSampler(window=60, limit=1, clock=clock)
+
+    for _ in range(3):
+        sampler.sample(logger, *occurrence())
+
+    clock.now = 61
+    assert sampler.sample(logger, *occurrence()) is True
+
+    assert logger.log.call_count == 1
+    args = logger.log.call_args[0]
+    assert args[0] == logging.WARNING
+    assert args[1] % args[2:] == (
+        f"Unhandled exception occurred. [fingerprint={args[3]}]: suppressed 2 of 3 occurrences in 60s."
+    )
+
+
+def test_sampler_sweeps_expired_fingerprints():
+    clock = Clock()
+    logger = mock.Mock()
+    sampler = log.LogSampler(window=60, limit=1, clock=clock)
+
+    sampler.sample(logger, *occurrence(type_="a"))
+    sampler.sample(logger, *occurrence(type_="a"))
+
+    clock.now = 61
+    sampler.sample(logger, *occurrence(type_="b"))
+
+    assert logger.log.call_count == 1
+    assert len(sampler._entries) == 1
+
+
+def test_sampler_fingerprints_distinct_problems():
+    clock = Clock()
+    logger = mock.Mock()
+    sampler = log.LogSampler(window=60, limit=1, clock=clock)
+
+    assert sampler.sample(logger, *occurrence(type_="a")) is True
+    assert sampler.sample(logger, *occurrence(type_="b")) is True
+    assert sampler.sample(logger, raise_other_error(), error.Problem("Other", type_="a")) is True
+
+
+def test_sampler_bounded_fingerprints():
+    clock = Clock()
+    logger = mock.Mock()
+    sampler = log.LogSampler(window=60, limit=1, max_fingerprints=2, clock=clock)
+
+    sampler.sample(logger, *occurrence(type_="a"))
+    sampler.sample(logger, *occurrence(type_="a"))
+    sampler.sample(logger, *occurrence(type_="b"))
+    sampler.sample(logger, *occurrence(type_="c"))
+
+    assert len(sampler._entries) == len(["b", "c"])
+    assert logger.log.call_count == 1
+    assert sampler.sample(logger, *occurrence(type_="a")) is True
+
+
+def test_sampler_flush():
+    clock = Clock()
+    logger = mock.Mock()
+    sampler = log.LogSampler(window=60, limit=1, clock=clock)
+
+    sampler.sample(logger, *occurrence(type_="a"))
+    sampler.sample(logger, *occurrence(type_="a"))
+    sampler.sample(logger, *occurrence(type_="b"))
+    sampler.flush(logger)
+
+    assert logger.log.call_count == 1
+    assert sampler._entries == {}
+
+
+def test_sampler_sweep():
+    clock = Clock()
+    logger = mock.Mock()
+    sampler = log.LogSampler(window=60, limit=1, clock=clock)
+
+    assert sampler.sweep(logger) == 60  # noqa: PLR2004
+
+    sampler.sample(logger, *occurrence(type_="a"))
+    sampler.sample(logger, *occurrence(type_="a"))
+    clock.now = 30
+    sampler.sample(logger, *occurrence(type_="b"))
+    sampler.sample(logger, *occurrence(type_="b"))
+
+    clock.now = 45
+    assert sampler.sweep(logger) == 15  # noqa: PLR2004
+    assert logger.log.call_count == 0
+
+    clock.now = 60
+    assert sampler.sweep(logger) == 30  # noqa: PLR2004
+    assert logger.log.call_count == 1
+    assert len(sampler._entries) == 1
+
+
+async def test_sampler_run_summarises_on_timer():
+    logger = mock.Mock()
+    sampler = log.LogSampler(window=0.05, limit=1)
+
+    sampler.sample(logger, *occurrence())
+    sampler.sample(logger, *occurrence())
+
+    async with sampler.running(logger):
+        await anyio.sleep(0.2)
+        assert logger.log.call_count == 1
+
+    assert logger.log.call_count == 1
+    assert sampler._entries == {}
+
+
+async def test_sampler_flushed_on_shutdown():
+    logger = mock.Mock()
+    sampler = log.LogSampler(window=60, limit=1)
+    app = Starlette()
+    handler.add_exception_handler(app, logger=logger, log_sampler=sampler)
+
+    async with app.router.lifespan_context(app):
+        sampler.sample(logger, *occurrence())
+        sampler.sample(logger, *occurrence())
+        assert logger.log.call_count == 0
+
+    assert logger.log.call_count == 1
+    assert sampler._entries == {}
@@ -0,0 +1,85 @@
+import threading
+
+import httpx
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.routing import Route
+
+from starlette_problem import handler, metrics
+
+
+def test_record_and_collect():
+    m = metrics.ProblemMetrics(buckets=[0.1, 1.0])
+
+    m.record(404, "http-not-found", HTTPException, 0.05)
+    m.record(404, "http-not-found", HTTPException, 0.5)
+    m.record(500, "unhandled-exception", ValueError, 2.0)
+
+    counts, buckets, total, count = m.collect()
+
+    assert counts == {
+        (404, "http-not-found", HTTPException): 2,
+        (500, "unhandled-exception", ValueError): 1,
+    }
+    assert buckets == [1, 1, 1]
+    assert (total, count) == (2.55, 3)
+
+
+def test_record_from_threads_aggregated():
+    m = metrics.ProblemMetrics()
+
+    def record():
+        for _ in range(100):
+            m.record(404, "http-not-found", HTTPException, 0.001)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counts, _buckets, _total, count = m.collect()
+
+    assert counts == {(404, "http-not-found", HTTPException): 400}
+    assert count == len(threads) * 100
+    assert len(m._shards) == len(threads)
+
+
+def test_exposition():
+    m = metrics.ProblemMetrics(buckets=[0.1, 1.0], namespace="app")
+
+    m.record(500, 'quoted-"type"', ValueError, 0.05)
+    m.record(404, "http-not-found", HTTPException, 0.5)
+
+    assert m.exposition() == (
+        "# HELP app_problems_total Problems rendered by the exception handler.\n"
+        "# TYPE app_problems_total counter\n"
+        'app_problems_total{status="404",type="http-not-found",exception="starlette.exceptions.HTTPException"} 1\n'
+        'app_problems_total{status="500",type="quoted-\\"type\\"",exception="builtins.ValueError"} 1\n'
+        "# HELP app_handler_duration_seconds Time spent in the exception handler.\n"
+        "# TYPE app_handler_duration_seconds histogram\n"
+        'app_handler_duration_seconds_bucket{le="0.1"} 1\n'
+        'app_handler_duration_seconds_bucket{le="1.0"} 2\n'
+        'app_handler_duration_seconds_bucket{le="+Inf"} 2\n'
+        "app_handler_duration_seconds_sum 0.55\n"
+        "app_handler_duration_seconds_count 2\n"
+    )
+
+
+async def test_metrics_endpoint():
+    m = metrics.ProblemMetrics()
+    app = Starlette(routes=[Route("/metrics", metrics.metrics_endpoint(m))])
+    handler.add_exception_handler(app, metrics=m)
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False, client=("1.2.3.4", 123))
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    await client.get("/missing")
+    r = await client.get("/metrics")
+
+    assert r.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    assert (
+        'starlette_problem_problems_total{status="404",type="http-not-found",exception="starlette.exceptions.HTTPException"} 1'
+        in r.text.splitlines()
+    )
+    assert "starlette_problem_handler_duration_seconds_count 1" in r.text.splitlines()
@@ -0,0 +1,245 @@
+import http
+from unittest import mock
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from starlette_problem import error, handler
+from starlette_problem.middleware import ProblemMiddleware
+
+
+class SomethingWrongError(error.ServerProblem):
+    title = "This is an error."
+
+
+async def raise_problem(_request):
+    raise SomethingWrongError(detail="something bad")
+
+
+async def raise_http_exception(_request):
+    raise HTTPException(status_code=http.HTTPStatus.FORBIDDEN, headers={"x-header": "value"})
+
+
+async def raise_exception(_request):
+    msg = "Something went bad"
+    raise RuntimeError(msg)
+
+
+def raise_exception_sync(_request):
+    msg = "Something went bad"
+    raise RuntimeError(msg)
+
+
+async def raise_large_problem(_request):
+    msg = "Request validation failed."
+    raise error.UnprocessableProblem(msg, errors=[{"loc": ["body", i], "msg": "Field required."} for i in range(100)])
+
+
+async def raise_after_start(_request):
+    async def stream():
+        yield b"partial"
+        msg = "Something went bad"
+        raise RuntimeError(msg)
+
+    return StreamingResponse(stream())
+
+
+class AuthMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if request.url.path == "/unauthorised":
+            msg = "Not authorised."
+            raise error.UnauthorisedProblem(msg)
+        return await call_next(request)
+
+
+def app(**kwargs):
+    app_ = Starlette(
+        routes=[
+            Route("/problem", raise_problem),
+            Route("/http-exception", raise_http_exception),
+            Route("/exception", raise_exception),
+            Route("/exception-sync", raise_exception_sync),
+            Route("/after-start", raise_after_start),
+            Route("/large-problem", raise_large_problem),
+        ],
+        middleware=[
+            Middleware(CORSMiddleware, allow_origins=["https://example.com"]),
+            Middleware(AuthMiddleware),
+        ],
+    )
+    eh = handler.add_exception_handler(app_, middleware=True, **kwargs)
+    return app_, eh
+
+
+@pytest.fixture
+def client():
+    app_, _ = app()
+    transport = httpx.ASGITransport(app=app_, raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transport, base_url="https://test")
+
+
+async def test_problem(client):
+    r = await client.get("/problem")
+
+    assert r.status_code == http.HTTPStatus.INTERNAL_SERVER_ERROR
+    assert r.headers["content-type"] == "application/problem+json"
+    assert r.json() == {
+        "type": "something-wrong",
+        "title": "This is an error.",
+        "detail": "something bad",
+        "status": 500,
+    }
+
+
+async def test_http_exception(client):
+    r = await client.get("/http-exception")
+
+    assert r.status_code == http.HTTPStatus.FORBIDDEN
+    assert r.headers["x-header"] == "value"
+    assert r.json() == {
+        "type": "http-forbidden",
+        "title": "Forbidden",
+        "detail": "Forbidden",
+        "status": 403,
+    }
+
+
+async def test_not_found(client):
+    r = await client.get("/missing")
+
+    assert r.status_code == http.HTTPStatus.NOT_FOUND
+    assert r.json()["type"] == "http-not-found"
+
+
+@pytest.mark.parametrize("path", ["/exception", "/exception-sync"])
+async def test_unhandled_exception_passes_through_other_middleware(client, path):
+    r = await client.get(path, headers={"origin": "https://example.com"})
+
+    assert r.status_code == http.HTTPStatus.INTERNAL_SERVER_ERROR
+    assert r.headers["access-control-allow-origin"] == "https://example.com"
+    assert r.json() == {
+        "type": "unhandled-exception",
+        "title": "Unhandled exception occurred.",
+        "detail": "Something went bad",
+        "status": 500,
+    }
+
+
+@pytest.mark.parametrize("path", ["/problem", "/http-exception", "/exception"])
+async def test_handled_by_middleware(client, path):
+    with mock.patch("starlette_problem.middleware.Request", wraps=Request) as request:
+        r = await client.get(path)
+
+    assert r.headers["content-type"] == "application/problem+json"
+    assert request.call_count == 1
+
+
+async def test_problem_raised_in_user_middleware(client):
+    r = await client.get("/unauthorised")
+
+    assert r.status_code == http.HTTPStatus.UNAUTHORIZED
+    assert r.headers["content-type"] == "application/problem+json"
+    assert r.json() == {
+        "type": "unauthorised-problem",
+        "title": "Base http exception.",
+        "detail": "Not authorised.",
+        "status": 401,
+    }
+
+
+async def test_streamed_problem():
+    app_, _ = app(stream_threshold=100)
+    transport = httpx.ASGITransport(app=app_)
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    r = await client.get("/large-problem", headers={"origin": "https://example.com"})
+
+    assert r.status_code == http.HTTPStatus.UNPROCESSABLE_ENTITY
+    assert r.headers["access-control-allow-origin"] == "https://example.com"
+    assert "content-length" not in r.headers
+    assert len(r.json()["errors"]) == len(range(100))
+
+
+async def test_background_task_run():
+    background = mock.AsyncMock()
+
+    async def eh(_request, _exc):
+        return PlainTextResponse("handled", background=BackgroundTask(background))
+
+    app_ = Starlette(
+        routes=[Route("/exception", raise_exception)],
+        middleware=[Middleware(ProblemMiddleware, handler=eh)],
+    )
+    transport = httpx.ASGITransport(app=app_)
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    await client.get("/exception")
+
+    assert background.await_count == 1
+
+
+async def test_unhandled_exception_logged():
+    logger = mock.Mock()
+    app_, _ = app(logger=logger)
+    transport = httpx.ASGITransport(app=app_, raise_app_exceptions=False)
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    await client.get("/exception")
+
+    assert logger.exception.call_args[0] == ("Unhandled exception occurred.",)
+
+
+async def test_response_started_reraises():
+    logger = mock.Mock()
+    app_, _ = app(logger=logger)
+    transport = httpx.ASGITransport(app=app_)
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    with pytest.raises(RuntimeError, match="Something went bad"):
+        await client.get("/after-start")
+
+    # Re-raised past the middleware, the exception is only logged by the
+    # outermost fallback handler, as in the default mode.
+    assert logger.exception.call_count == 1
+
+
+async def test_non_http_passthrough():
+    app_ = mock.AsyncMock(side_effect=RuntimeError("Something went bad"))
+    middleware = ProblemMiddleware(app_, handler.ExceptionHandler())
+    scope = {"type": "websocket"}
+
+    with pytest.raises(RuntimeError, match="Something went bad"):
+        await middleware(scope, mock.Mock(), mock.Mock())
+
+
+async def test_async_handler_awaited():
+    async def eh(_request, _exc):
+        return PlainTextResponse("handled", status_code=http.HTTPStatus.IM_A_TEAPOT)
+
+    app_ = Starlette(
+        routes=[Route("/exception", raise_exception)],
+        middleware=[Middleware(ProblemMiddleware, handler=eh)],
+    )
+    transport = httpx.ASGITransport(app=app_)
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    r = await client.get("/exception")
+
+    assert (r.status_code, r.text) == (http.HTTPStatus.IM_A_TEAPOT, "handled")
+
+
+def test_add_after_start():
+    app_ = Starlette()
+    app_.middleware_stack = app_.build_middleware_stack()
+
+    with pytest.raises(RuntimeError, match="Cannot add middleware after an application has started"):
+        handler.add_exception_handler(app_, middleware=True)
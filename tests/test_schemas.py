@@ -1,5 +1,10 @@
+import http
+import json
+from unittest import mock
+
 import httpx
 import pytest
+from rfc9457.openapi import problem_response
 from starlette.applications import Starlette
 from starlette.routing import Route
 
@@ -59,6 +64,29 @@ async def test_openapi_schema(app):
     assert (
         r.content
         == b"""components:
+  responses:
+    ClientError:
+      content:
+        application/problem+json:
+          example:
+            detail: Additional error context.
+            status: 400
+            title: User facing error message.
+            type: client-error-type
+          schema:
+            $ref: '#/components/schemas/Problem'
+      description: Client Error
+    ServerError:
+      content:
+        application/problem+json:
+          example:
+            detail: Additional error context.
+            status: 500
+            title: User facing error message.
+            type: server-error-type
+          schema:
+            $ref: '#/components/schemas/Problem'
+      description: Server Error
   schemas:
     Problem:
       properties:
@@ -118,27 +146,9 @@ paths:
           - username: tom
           - username: lucy
         4XX:
-          content:
-            application/problem+json:
-              example:
-                detail: Additional error context.
-                status: 400
-                title: User facing error message.
-                type: client-error-type
-              schema:
-                $ref: '#/components/schemas/Problem'
-          description: Client Error
+          $ref: '#/components/responses/ClientError'
         5XX:
-          content:
-            application/problem+json:
-              example:
-                detail: Additional error context.
-                status: 500
-                title: User facing error message.
-                type: server-error-type
-              schema:
-                $ref: '#/components/schemas/Problem'
-          description: Server Error
+          $ref: '#/components/responses/ServerError'
     post:
       responses:
         200:
@@ -146,27 +156,9 @@ paths:
           examples:
             username: tom
         4XX:
-          content:
-            application/problem+json:
-              example:
-                detail: Additional error context.
-                status: 400
-                title: User facing error message.
-                type: client-error-type
-              schema:
-                $ref: '#/components/schemas/Problem'
-          description: Client Error
+          $ref: '#/components/responses/ClientError'
         5XX:
-          content:
-            application/problem+json:
-              example:
-                detail: Additional error context.
-                status: 500
-                title: User facing error message.
-                type: server-error-type
-              schema:
-                $ref: '#/components/schemas/Problem'
-          description: Server Error
+          $ref: '#/components/responses/ServerError'
 """
     )
 
@@ -178,6 +170,40 @@ async def test_openapi_json(app):
     r = await client.get("/openapi.json")
     assert r.json() == {
         "components": {
+            "responses": {
+                "ClientError": {
+                    "content": {
+                        "application/problem+json": {
+                            "example": {
+                                "detail": "Additional error context.",
+                                "status": 400,
+                                "title": "User facing error message.",
+                                "type": "client-error-type",
+                            },
+                            "schema": {
+                                "$ref": "#/components/schemas/Problem",
+                            },
+                        },
+                    },
+                    "description": "Client Error",
+                },
+                "ServerError": {
+                    "content": {
+                        "application/problem+json": {
+                            "example": {
+                                "detail": "Additional error context.",
+                                "status": 500,
+                                "title": "User facing error message.",
+                                "type": "server-error-type",
+                            },
+                            "schema": {
+                                "$ref": "#/components/schemas/Problem",
+                            },
+                        },
+                    },
+                    "description": "Server Error",
+                },
+            },
             "schemas": {
                 "Problem": {
                     "properties": {
@@ -270,36 +296,10 @@ async def test_openapi_json(app):
                             ],
                         },
                         "4XX": {
-                            "content": {
-                                "application/problem+json": {
-                                    "example": {
-                                        "detail": "Additional error context.",
-                                        "status": 400,
-                                        "title": "User facing error message.",
-                                        "type": "client-error-type",
-                                    },
-                                    "schema": {
-                                        "$ref": "#/components/schemas/Problem",
-                                    },
-                                },
-                            },
-                            "description": "Client Error",
+                            "$ref": "#/components/responses/ClientError",
                         },
                         "5XX": {
-                            "content": {
-                                "application/problem+json": {
-                                    "example": {
-                                        "detail": "Additional error context.",
-                                        "status": 500,
-                                        "title": "User facing error message.",
-                                        "type": "server-error-type",
-                                    },
-                                    "schema": {
-                                        "$ref": "#/components/schemas/Problem",
-                                    },
-                                },
-                            },
-                            "description": "Server Error",
+                            "$ref": "#/components/responses/ServerError",
                         },
                     },
                 },
@@ -312,36 +312,10 @@ async def test_openapi_json(app):
                             },
                         },
                         "4XX": {
-                            "content": {
-                                "application/problem+json": {
-                                    "example": {
-                                        "detail": "Additional error context.",
-                                        "status": 400,
-                                        "title": "User facing error message.",
-                                        "type": "client-error-type",
-                                    },
-                                    "schema": {
-                                        "$ref": "#/components/schemas/Problem",
-                                    },
-                                },
-                            },
-                            "description": "Client Error",
+                            "$ref": "#/components/responses/ClientError",
                         },
                         "5XX": {
-                            "content": {
-                                "application/problem+json": {
-                                    "example": {
-                                        "detail": "Additional error context.",
-                                        "status": 500,
-                                        "title": "User facing error message.",
-                                        "type": "server-error-type",
-                                    },
-                                    "schema": {
-                                        "$ref": "#/components/schemas/Problem",
-                                    },
-                                },
-                            },
-                            "description": "Server Error",
+                            "$ref": "#/components/responses/ServerError",
                         },
                     },
                 },
@@ -406,3 +380,166 @@ async def test_no_generic_defaults():
     r = await client.get("/openapi.json")
     data = r.json()
     assert "4XX" not in data["paths"]["/users"]["get"]["responses"]
+    assert "responses" not in data["components"]
+
+
+async def test_generic_defaults_computed_once():
+    schemas = SchemaGenerator(
+        {"openapi": "3.0.0", "info": {"title": "Example API", "version": "1.0"}},
+        generic_defaults=True,
+        documentation_uri_template="https://docs/{type}",
+    )
+
+    with mock.patch("starlette_problem.schemas.problem_response", wraps=problem_response) as problem_response_:
+        first = schemas.get_schema([])
+        second = schemas.get_schema([])
+
+    assert [c.kwargs["description"] for c in problem_response_.call_args_list] == ["Client Error", "Server Error"]
+    assert first["components"]["responses"] == second["components"]["responses"]
+    example = first["components"]["responses"]["ServerError"]["content"]["application/problem+json"]["example"]
+    assert example["type"] == "https://docs/server-error-type"
+
+
+def cached_app(**kwargs):
+    schemas = SchemaGenerator(
+        {"openapi": "3.0.0", "info": {"title": "Example API", "version": "1.0"}},
+        generic_defaults=True,
+        **kwargs,
+    )
+
+    def list_users(request):
+        """
+        responses:
+          200:
+            description: A list of users.
+        """
+        raise NotImplementedError
+
+    def openapi_json(request):
+        return schemas.OpenAPIJsonResponse(request=request)
+
+    routes = [
+        Route("/users", endpoint=list_users, methods=["GET"]),
+        Route("/openapi.json", endpoint=openapi_json, include_in_schema=False),
+    ]
+
+    return schemas, Starlette(routes=routes)
+
+
+@pytest.mark.parametrize(
+    ("kwargs", "dumps_kwargs"),
+    [
+        ({}, {}),
+        ({"encoder": "json"}, {"ensure_ascii": False, "separators": (",", ":")}),
+    ],
+)
+async def test_openapi_json_format(kwargs, dumps_kwargs):
+    schemas, app = cached_app(**kwargs)
+    schemas.base_schema["info"]["title"] = "Schéma"
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False, client=("1.2.3.4", 123))
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    r = await client.get("/openapi.json")
+    assert r.content == json.dumps(schemas.get_schema(app.routes), **dumps_kwargs).encode()
+
+
+async def test_openapi_json_cached():
+    schemas, app = cached_app()
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False, client=("1.2.3.4", 123))
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    with mock.patch.object(schemas, "get_schema", wraps=schemas.get_schema) as get_schema:
+        first = await client.get("/openapi.json")
+        second = await client.get("/openapi.json")
+
+    assert get_schema.call_count == 1
+    assert first.content == second.content
+    assert first.headers["etag"] == second.headers["etag"]
+
+
+async def test_openapi_json_cache_invalidated_by_routes():
+    _schemas, app = cached_app()
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False, client=("1.2.3.4", 123))
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    first = await client.get("/openapi.json")
+
+    def list_groups(request):
+        """
+        responses:
+          200:
+            description: A list of groups.
+        """
+        raise NotImplementedError
+
+    app.add_route("/groups", list_groups, methods=["GET"])
+    second = await client.get("/openapi.json")
+
+    assert "/groups" not in first.json()["paths"]
+    assert "/groups" in second.json()["paths"]
+    assert first.headers["etag"] != second.headers["etag"]
+
+
+@pytest.mark.parametrize("template", ["{}", "W/{}", '"other", {}', "*"])
+async def test_openapi_json_not_modified(template):
+    _schemas, app = cached_app()
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False, client=("1.2.3.4", 123))
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    first = await client.get("/openapi.json")
+    r = await client.get("/openapi.json", headers={"if-none-match": template.format(first.headers["etag"])})
+
+    assert r.status_code == http.HTTPStatus.NOT_MODIFIED
+    assert r.content == b""
+    assert r.headers["etag"] == first.headers["etag"]
+
+
+async def test_openapi_json_modified():
+    _schemas, app = cached_app()
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False, client=("1.2.3.4", 123))
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    r = await client.get("/openapi.json", headers={"if-none-match": '"stale"'})
+
+    assert r.status_code == http.HTTPStatus.OK
+
+
+async def test_openapi_json_gzip():
+    _schemas, app = cached_app(gzip=True)
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False, client=("1.2.3.4", 123))
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    plain = await client.get("/openapi.json", headers={"accept-encoding": "identity"})
+    compressed = await client.get("/openapi.json", headers={"accept-encoding": "gzip"})
+
+    assert "content-encoding" not in plain.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == plain.headers["vary"] == "Accept-Encoding"
+    assert compressed.headers["etag"] != plain.headers["etag"]
+    assert compressed.json() == plain.json()
+
+    r = await client.get(
+        "/openapi.json",
+        headers={"accept-encoding": "gzip", "if-none-match": compressed.headers["etag"]},
+    )
+    assert r.status_code == http.HTTPStatus.NOT_MODIFIED
+
+
+async def test_openapi_json_clear_cache():
+    schemas, app = cached_app()
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False, client=("1.2.3.4", 123))
+    client = httpx.AsyncClient(transport=transport, base_url="https://test")
+
+    with mock.patch.object(schemas, "get_schema", wraps=schemas.get_schema) as get_schema:
+        await client.get("/openapi.json")
+        schemas.clear_cache()
+        await client.get("/openapi.json")
+
+    assert get_schema.call_args_list == [mock.call(routes=app.routes)] * 2
@@ -1,8 +1,10 @@
+import http
 import sys
 
 import pytest
 
 from starlette_problem import util
+from starlette_problem.error import Problem
 
 
 @pytest.mark.parametrize(
@@ -35,3 +37,128 @@ def test_convert_status_code_legacy(status_code, title, code):
 @pytest.mark.skipif(sys.version_info < (3, 13), reason="python version too old")
 def test_convert_status_code(status_code, title, code):
     assert util.convert_status_code(status_code) == (title, code)
+
+
+@pytest.mark.parametrize(
+    ("status_code", "title", "code"),
+    [
+        (499, "Client Error", "http-client-error"),
+        (599, "Server Error", "http-server-error"),
+        (299, "Success", "http-success"),
+    ],
+)
+def test_convert_status_code_non_standard(status_code, title, code):
+    assert util.convert_status_code(status_code) == (title, code)
+
+
+@pytest.mark.parametrize("status_code", [0, 99, 600, 999])
+def test_convert_status_code_invalid(status_code):
+    with pytest.raises(ValueError, match=f"{status_code} is not a valid HTTP status code"):
+        util.convert_status_code(status_code)
+
+
+def test_convert_status_code_no_allocation():
+    assert util.convert_status_code(404) is util.convert_status_code(404)
+
+
+def test_register_status_code(monkeypatch):
+    monkeypatch.setattr(util, "STATUS_CODES", dict(util.STATUS_CODES))
+
+    util.register_status_code(499, "Client Closed Request")
+    util.register_status_code(599, "Network Connect Timeout Error", "network-timeout")
+
+    assert util.convert_status_code(499) == ("Client Closed Request", "http-client-closed-request")
+    assert util.convert_status_code(599) == ("Network Connect Timeout Error", "network-timeout")
+
+
+def test_register_status_code_invalid():
+    with pytest.raises(ValueError, match="999 is not a valid HTTP status code"):
+        util.register_status_code(999, "Invalid")
+
+
+def test_status_table():
+    table = util.status_table({"4xx": "client", "404": "not-found", 409: "conflict", "default": "default"})
+
+    assert (table[400], table[404], table[409], table[499]) == ("client", "not-found", "conflict", "client")
+    assert http.HTTPStatus.INTERNAL_SERVER_ERROR not in table
+    assert len(table) == len(range(400, 500))
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        ("", False),
+        ("gzip", True),
+        ("GZIP", True),
+        ("deflate, gzip;q=0.5", True),
+        ("br;q=1.0, gzip;q=0", False),
+        ("*", True),
+        ("gzip;q=0, *", False),
+        ("identity", False),
+        ("gzip;q=bad", False),
+    ],
+)
+def test_accepts_encoding(accept_encoding, expected):
+    assert util.accepts_encoding(accept_encoding, "gzip") is expected
+
+
+OFFERED = ("application/problem+json", "application/problem+msgpack", "application/problem+cbor")
+
+
+@pytest.mark.parametrize(
+    ("accept", "expected"),
+    [
+        ("", None),
+        ("text/html", None),
+        ("*/*", "application/problem+json"),
+        ("application/*", "application/problem+json"),
+        ("application/problem+msgpack", "application/problem+msgpack"),
+        ("APPLICATION/PROBLEM+CBOR", "application/problem+cbor"),
+        ("application/problem+json;q=0.5, application/problem+msgpack", "application/problem+msgpack"),
+        ("application/problem+cbor, application/problem+msgpack", "application/problem+msgpack"),
+        ("application/problem+msgpack;q=0.9, */*;q=0.1", "application/problem+msgpack"),
+        ("application/problem+json;q=0, application/*;q=0.5", "application/problem+msgpack"),
+        ("application/problem+msgpack;q=0", None),
+        ("application/problem+msgpack;q=bad, */*;q=0.1", "application/problem+json"),
+    ],
+)
+def test_negotiate_media_type(accept, expected):
+    assert util.negotiate_media_type(accept, OFFERED) == expected
+
+
+def raise_error(msg):
+    try:
+        raise ValueError(msg)  # noqa: TRY301
+    except ValueError as e:
+        return e
+
+
+def raise_error_elsewhere(msg):
+    try:
+        raise ValueError(msg)  # noqa: TRY301
+    except ValueError as e:
+        return e
+
+
+def test_fingerprint_ignores_message():
+    problem = Problem("title", type_="a")
+
+    assert util.fingerprint(raise_error("a"), problem) == util.fingerprint(raise_error("b"), problem)
+
+
+def test_fingerprint_distinguishes_location():
+    problem = Problem("title", type_="a")
+
+    assert util.fingerprint(raise_error("a"), problem) != util.fingerprint(raise_error_elsewhere("a"), problem)
+
+
+def test_fingerprint_distinguishes_problem_type():
+    exc = raise_error("a")
+
+    assert util.fingerprint(exc, Problem("title", type_="a")) != util.fingerprint(exc, Problem("title", type_="b"))
+
+
+def test_fingerprint_distinguishes_exception_class():
+    problem = Problem("title", type_="a")
+
+    assert util.fingerprint(ValueError("a"), problem) != util.fingerprint(TypeError("a"), problem)